@@ -8,23 +8,55 @@ import subprocess
 import threading
 import time
 import tkinter as tk
-from tkinter import messagebox, ttk, font
+import zipfile
+from tkinter import filedialog, messagebox, ttk, font
 
 # Third-party library imports
 from PIL import Image, ImageTk
 import pandas as pd
-from openpyxl import load_workbook
 from tkcalendar import Calendar
-import webbrowser
 import queue
 
 # Import configuration from external file
 from config import team_roster, event_codes
+from event_export import EVENT_EXPORT_FORMATS, write_event_file
+from event_import import import_event_file, read_event_log
+from event_merge import merge_event_logs
+from event_schema import game_content_hash
+from event_store import QUARTER, updated_row
+from excel_export import ExportCancelled, open_workbook
+from export_manifest import plan_export
+from game_export import export_files
+from game_session import GameSession, GameWriter
+from games_catalog import GAMES_DIRECTORY, GamesCatalog, migrate_games_directory, save_game
+from season_archive import ADDED, ALREADY_ARCHIVED, CHANGED, append_game, migrate_archive, read_game, read_index
+from workbook_import import read_workbook_game
 
 # Initialize global variables
-event_log = []  # Stores the log of events for the current game
+game_sessions = {}  # Notebook tab -> (GameSession, its Event Log text widget), one per open game
+current_session = None  # The game session of the selected tab
+game_info = {}  # Game info of the selected game, entered in the Game Info frame
+event_store = None  # Log of events of the selected game
+event_log_text = None  # Event Log text widget of the selected game
+box_score_text = None  # Text widget of the open Box Score window, or None
+games_catalog = GamesCatalog()  # Headers of saved games, bodies loaded on demand
+game_preview_events = 5  # Events shown for the selected game in Previous Games
 gui_update_queue = queue.Queue()  # Queue for GUI updates
 stop_threads = False  # Flag to control thread execution
+autosave_interval_ms = 60000  # How often open games are saved in the background
+export_cancel_event = None  # Set to cancel the export running in the background; None when idle
+event_file_types = [("CSV/TSV files", "*.csv *.tsv *.txt"), ("All files", "*.*")]
+merge_file_types = [
+    ("Event logs", "*.jsonl *.ndjson *.csv *.tsv *.txt *.gz"),
+    ("Saved games", "*.jsonl"),
+    ("All files", "*.*"),
+]
+event_export_file_types = [
+    ("CSV files", "*.csv"),
+    ("NDJSON files", "*.ndjson"),
+    ("HTML pages", "*.html"),
+    ("Compressed CSV/NDJSON", "*.csv.gz *.ndjson.gz"),
+]
 
 # ========================FUNCTIONS===========================================
 def parse_date(date_str):
@@ -40,20 +72,30 @@ def parse_time(time_str):
         raise ValueError("Invalid time format. Please use HH:MM in 24-hour format.")
 
 def start_new_game_log():
-    global game_info, event_log
-    game_info = {}  # Initialize a dictionary to store game info
-
+    # The game info is only replaced once every field is valid, so a typo never leaves the
+    # session with part of its game info (autosave, the tab title and closing need all of it)
     try:
-        game_info["date"] = parse_date(date_entry.get().strip())
-        game_info["start_time"] = parse_time(start_time_entry.get().strip())
+        new_game_info = {
+            "date": parse_date(date_entry.get().strip()),
+            "start_time": parse_time(start_time_entry.get().strip()),
+        }
     except ValueError as e:
         messagebox.showerror("Input Error", str(e))
         return  # Exit the function if there's an error
 
-    game_info["location"] = location_entry.get()
-    game_info["opponent"] = opponent_entry.get()
-    game_info["quarter"] = quarter_combobox.get().strip()
+    new_game_info["location"] = location_entry.get()
+    new_game_info["opponent"] = opponent_entry.get()
+    new_game_info["quarter"] = quarter_combobox.get().strip()
+    game_info.clear()  # The dictionary belongs to the selected game session
+    game_info.update(new_game_info)
+    show_game_info()
+
 
+def show_game_info():
+    session_notebook.tab(session_notebook.select(), text=current_session.title())
+    if not game_info:
+        game_info_response.config(text="")
+        return
     game_info_response.config(
         text=f"{game_info['date']}\n{game_info['start_time']}\n{game_info['location']}\n{game_info['opponent']}\n{game_info['quarter']}",
         justify="left",
@@ -79,7 +121,6 @@ def add_event(video_time, player_number, event_code):
         player_number = validate_player_number(player_number)
         validate_event_code(event_code)
 
-        player_name = ' '.join(team_roster[player_number][:2])
         event_description = event_codes[event_code]
 
         event_data = [
@@ -94,10 +135,7 @@ def add_event(video_time, player_number, event_code):
             event_description,
             event_code,
         ]
-        event_log.append(event_data)
-        event_log_text.insert(
-            tk.END, f"{video_time} #{player_number} {player_name} {event_description}\n"
-        )
+        event_store.add(event_data)
         clear_event_entry()
         video_time_entry.focus()
         video_time_entry.select_range(0, tk.END)
@@ -105,6 +143,283 @@ def add_event(video_time, player_number, event_code):
         messagebox.showerror("Event Entry Error", str(e))
 
 
+def format_event_line(event_data):
+    video_time, player_number, first_name, last_name, event_description = event_data[5:10]
+    return f"{video_time} #{player_number} {first_name} {last_name} {event_description}\n"
+
+
+def import_events():
+    if not game_info:
+        messagebox.showerror("Import Error", "Enter the game info before importing events.")
+        return
+
+    path = filedialog.askopenfilename(title="Import Events", filetypes=event_file_types)
+    if not path:
+        return
+
+    try:
+        rows, errors = import_event_file(path, game_info)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Import Error", str(e))
+        return
+
+    # Report every invalid row at once and import nothing until the file is fixed
+    if errors:
+        report = "\n".join(errors[:25])
+        if len(errors) > 25:
+            report += f"\n...and {len(errors) - 25} more"
+        messagebox.showerror(
+            "Import Error", f"{len(errors)} row(s) failed validation, nothing was imported.\n\n{report}"
+        )
+        return
+
+    event_store.extend(rows)
+    export_status_label.config(text=f"Imported {len(rows)} events from {os.path.basename(path)}")
+
+
+def read_event_log_for_merge(path):
+    rows, errors = read_event_log(path, game_info)
+    if errors:
+        raise ValueError(f"{os.path.basename(path)} has {len(errors)} invalid row(s).\n{errors[0]}")
+    return rows
+
+
+def merge_event_log_files(with_base=False):
+    # Merge other operators' logs of this game into the current log
+    if not game_info:
+        messagebox.showerror("Merge Error", "Enter the game info before merging event logs.")
+        return
+
+    base_path = None
+    if with_base:
+        base_path = filedialog.askopenfilename(title="Select the Common Base Log", filetypes=merge_file_types)
+        if not base_path:
+            return
+    paths = filedialog.askopenfilenames(title="Select Event Logs to Merge", filetypes=merge_file_types)
+    if not paths:
+        return
+
+    try:
+        streams = [list(event_store.ordered())]
+        streams.extend(read_event_log_for_merge(path) for path in paths)
+        base = read_event_log_for_merge(base_path) if base_path else None
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Merge Error", str(e))
+        return
+
+    merged, conflicts = merge_event_logs(streams, base)
+    event_store.replace_all(merged)
+    export_status_label.config(
+        text=f"Merged {len(streams)} logs into {len(merged)} events, {len(conflicts)} conflict(s)"
+    )
+    if conflicts:
+        show_event_report("Merge Conflicts", conflicts, "")
+
+
+def update_event_log_text(changes):
+    # Only the selected game's store is changed from the GUI, so its Event Log is the one to patch.
+    # Patch only the affected lines: each event's line starts at the mark "ev<id>"
+    # and removed events are hidden with the elided "removed" tag, never re-rendered
+    added = []
+    for action, event_id in changes:
+        if action == "add":
+            added.append(event_id)
+        elif action == "remove":
+            event_log_text.tag_add("removed", f"ev{event_id}", f"ev{event_id} lineend +1c")
+        else:
+            event_log_text.tag_remove("removed", f"ev{event_id}", f"ev{event_id} lineend +1c")
+            event_log_text.see(f"ev{event_id}")
+
+    # New lines go in video time order: group added events that end up adjacent in the
+    # timeline and insert each group with one call before the line of the event that follows it
+    added.sort(key=event_store.time_key)
+    run = []
+    for position, event_id in enumerate(added):
+        run.append(event_id)
+        next_id = event_store.next_in_time(event_id)
+        if position + 1 < len(added) and next_id == added[position + 1]:
+            continue
+        start = event_log_text.index(f"ev{next_id}" if next_id is not None else "end-1c")
+        # No tags: text inserted between two removed lines would otherwise inherit "removed"
+        event_log_text.insert(start, "".join(format_event_line(event_store.get(i)) for i in run), ())
+        line_number = int(start.split(".")[0])
+        for offset, run_id in enumerate(run):
+            event_log_text.mark_set(f"ev{run_id}", f"{line_number + offset}.0")
+        event_log_text.see(f"ev{run[-1]}")
+        run = []
+
+    # Flag likely double entries inline instead of interrupting with a dialog
+    for action, event_id in changes:
+        flag_duplicates(event_id)
+    for event_id in added:
+        duplicates = event_store.find_duplicates(event_id)
+        if duplicates:
+            export_status_label.config(
+                text=f"Possible duplicate: {format_event_line(event_store.get(duplicates[0])).strip()}"
+            )
+    update_box_score()
+
+
+def flag_duplicates(event_id):
+    for flagged_id in [event_id] + event_store.find_duplicates(event_id):
+        line = (f"ev{flagged_id}", f"ev{flagged_id} lineend")
+        if event_store.is_live(flagged_id) and event_store.find_duplicates(flagged_id):
+            event_log_text.tag_add("duplicate", *line)
+        else:
+            event_log_text.tag_remove("duplicate", *line)
+
+
+def show_event_report(title, groups, empty_message):
+    # Show groups of event rows, separated by blank lines, in a read-only window
+    report_window = tk.Toplevel(root)
+    report_window.title(title)
+    report_text = tk.Text(report_window, height=20, width=47, font=custom_font)
+    report_text.pack(fill="both", expand=True)
+    if not groups:
+        report_text.insert(tk.END, empty_message + "\n")
+    for group in groups:
+        report_text.insert(tk.END, "".join(format_event_line(row) for row in group) + "\n")
+    report_text.config(state="disabled")
+
+
+def show_box_score():
+    # A live table of each player's event counts in the selected game
+    global box_score_text
+    if box_score_text is not None and box_score_text.winfo_exists():
+        box_score_text.winfo_toplevel().lift()
+        return
+    box_score_window = tk.Toplevel(root)
+    box_score_window.title("Box Score")
+    box_score_text = tk.Text(box_score_window, height=14, width=18 + 4 * len(event_codes), font=custom_font)
+    box_score_text.pack(fill="both", expand=True)
+    update_box_score()
+
+
+def update_box_score():
+    # Redraw the Box Score from the store's running totals; nothing is recounted
+    if box_score_text is None or not box_score_text.winfo_exists():
+        return
+    players = {str(number): last_name for number, (first_name, last_name) in team_roster.items()}
+    for player_number, event_code in event_store.totals:
+        players.setdefault(player_number, "")
+    lines = [f"{'Player':<18}" + "".join(f"{code:>4}" for code in event_codes)]
+    for player_number, last_name in players.items():
+        counts = [event_store.totals.get((player_number, code), 0) for code in event_codes]
+        lines.append(f"{'#' + player_number + ' ' + last_name:<18.18}" + "".join(f"{count:>4}" for count in counts))
+    team_counts = [
+        sum(count for (player_number, code), count in event_store.totals.items() if code == event_code)
+        for event_code in event_codes
+    ]
+    lines.append(f"{'Team':<18}" + "".join(f"{count:>4}" for count in team_counts))
+    box_score_text.config(state="normal")
+    box_score_text.delete("1.0", tk.END)
+    box_score_text.insert(tk.END, "\n".join(lines) + "\n")
+    box_score_text.config(state="disabled")
+
+
+def show_find_events():
+    # Filter the log by player, event code and quarter through the store's inverted indexes,
+    # and optionally correct every matching event at once
+    find_window = tk.Toplevel(root)
+    find_window.title("Find and Correct Events")
+    filter_frame = ttk.Frame(find_window)
+    filter_frame.pack(fill="x", padx=10, pady=10)
+
+    filters = {}
+    filter_values = {
+        "player_number": [""] + [str(number) for number in team_roster],
+        "event_code": [""] + list(event_codes),
+        "quarter": [""] + [option.strip() for option in options],
+    }
+    for column, (field, values) in enumerate(filter_values.items()):
+        ttk.Label(filter_frame, text=field.replace("_", " ").title() + ":").grid(column=column, row=0, sticky="w")
+        filters[field] = ttk.Combobox(filter_frame, values=values, width=12, state="readonly")
+        filters[field].grid(column=column, row=1, padx=5)
+
+    results_text = tk.Text(find_window, height=20, width=47, font=custom_font)
+
+    def on_find():
+        criteria = {field: combobox.get() or None for field, combobox in filters.items()}
+        event_ids = event_store.select(**criteria)
+        results_text.config(state="normal")
+        results_text.delete("1.0", tk.END)
+        results_text.insert(tk.END, f"{len(event_ids)} event(s)\n")
+        results_text.insert(tk.END, "".join(format_event_line(event_store.get(i)) for i in event_ids))
+        results_text.config(state="disabled")
+
+    ttk.Button(filter_frame, text="Find", command=on_find).grid(column=3, row=1, padx=5)
+
+    corrections = {}
+    for column, field in enumerate(("player_number", "event_code")):
+        ttk.Label(filter_frame, text=f"Change {field.replace('_', ' ')} to:").grid(column=column, row=2, sticky="w")
+        corrections[field] = ttk.Combobox(filter_frame, values=filter_values[field], width=12, state="readonly")
+        corrections[field].grid(column=column, row=3, padx=5)
+    ttk.Label(filter_frame, text="Change video time to:").grid(column=2, row=2, sticky="w")
+    corrections["video_time"] = ttk.Entry(filter_frame, width=12)
+    corrections["video_time"].grid(column=2, row=3, padx=5)
+
+    def on_correct():
+        criteria = {field: combobox.get() or None for field, combobox in filters.items()}
+        changes = {field: widget.get().strip() or None for field, widget in corrections.items()}
+        if not any(changes.values()):
+            return
+        try:
+            edited = event_store.edit_where(
+                lambda row: updated_row(row, team_roster, event_codes, **changes), **criteria
+            )
+        except ValueError as e:
+            messagebox.showerror("Correction Error", str(e), parent=find_window)
+            return
+        export_status_label.config(text=f"Corrected {len(edited)} event(s)")
+        on_find()
+
+    ttk.Button(filter_frame, text="Apply", command=on_correct).grid(column=3, row=3, padx=5)
+    results_text.pack(fill="both", expand=True)
+
+
+def show_duplicate_report():
+    groups = [
+        [event_store.get(event_id) for event_id in group] for group in event_store.duplicate_report()
+    ]
+    show_event_report("Duplicate Report", groups, "No likely duplicates found.")
+
+
+def undo_event(event=None):
+    if not event_store.undo():
+        export_status_label.config(text="Nothing to undo")
+    return "break"
+
+
+def redo_event(event=None):
+    if not event_store.redo():
+        export_status_label.config(text="Nothing to redo")
+    return "break"
+
+
+def update_edit_menu():
+    # Runs each time the Edit menu opens, so Undo and Redo match the selected game
+    edit_menu.entryconfig("Undo", state="normal" if event_store.can_undo() else "disabled")
+    edit_menu.entryconfig("Redo", state="normal" if event_store.can_redo() else "disabled")
+
+
+def delete_event_at(index):
+    # Find the event whose line contains the given Event Log index
+    for kind, name, position in event_log_text.dump(
+        "-mark", f"{index} linestart", f"{index} lineend"
+    ):
+        if name.startswith("ev") and event_store.is_live(int(name[2:])):
+            event_store.remove([int(name[2:])])
+            return
+
+
+def show_event_log_menu(event):
+    index = event_log_text.index(f"@{event.x},{event.y}")
+    event_log_menu.entryconfig(
+        "Delete Event", command=lambda: delete_event_at(index)
+    )
+    event_log_menu.tk_popup(event.x_root, event.y_root)
+
+
 def handle_event_entry(event):
     video_time_input = video_time_entry.get()
     player_number = player_number_entry.get()
@@ -156,62 +471,359 @@ def clear_all_data():
         player_number_entry,
         event_code_entry,
     )
-    global game_info, event_log
-    game_info = {}
-    event_log = []
+    game_info.clear()
+    reset_event_log()
+    show_game_info()
+
+
+def reset_event_log():
+    event_store.clear()
     event_log_text.delete("1.0", tk.END)
+    update_box_score()
+    event_log_text.mark_unset(*[name for name in event_log_text.mark_names() if name.startswith("ev")])
+
+
+def save_current_game():
+    if not game_info or not len(event_store):
+        messagebox.showerror("Save Error", "There is no game to save.")
+        return
+    try:
+        path = save_game(GAMES_DIRECTORY, game_info, event_store.ordered())
+        export_status_label.config(text=f"Game saved to {path}")
+    except OSError as e:
+        messagebox.showerror("Save Error", str(e))
+
+
+def export_events_file():
+    # Write the current game's events as NDJSON or CSV for analysis tools, or as an HTML table
+    if not game_info or not len(event_store):
+        messagebox.showerror("Export Error", "There is no game to export.")
+        return
+    opponent_without_spaces = game_info["opponent"].replace(" ", "_")
+    path = filedialog.asksaveasfilename(
+        title="Export Events",
+        initialfile=f"{game_info['date']}_{opponent_without_spaces}.csv",
+        defaultextension=".csv",
+        filetypes=event_export_file_types,
+    )
+    if not path:
+        return
+    try:
+        count = write_event_file(event_store.snapshot().ordered(), path)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Export Error", str(e))
+        return
+    export_status_label.config(text=f"Exported {count} events to {path}")
+
+
+def open_game(game_id, read_game_body):
+    # Open a saved game in the selected tab, or in a new tab if this one is already in use;
+    # read_game_body(game_id) returns (header, rows)
+    try:
+        header, rows = read_game_body(game_id)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        messagebox.showerror("Open Error", str(e))
+        return
+
+    if game_info or len(event_store):
+        new_game_session()
+    game_info.update({field: header[field] for field in ("date", "start_time", "location", "opponent")})
+    game_info["quarter"] = rows[0][QUARTER] if rows else ""
+    show_game_info()
+    event_store.extend(rows)
+    export_status_label.config(text=f"Opened {game_id}")
+
+
+def save_open_games():
+    # Queue a snapshot of every open game that changed; the background writer saves them
+    # while logging continues
+    for session, log_text in game_sessions.values():
+        snapshot = session.autosave_snapshot()
+        if snapshot is not None:
+            game_writer.save(session.game_info, snapshot.ordered())
+
+
+def autosave_game():
+    save_open_games()
+    root.after(autosave_interval_ms, autosave_game)
+
+
+def report_autosave_error(error):
+    gui_update_queue.put(lambda: export_status_label.config(text=f"Autosave failed: {error}"))
+
+
+def new_game_session():
+    # Each game gets its own tab and Event Log; the roster, event codes, timecode and
+    # background writer are shared by all of them
+    session = GameSession()
+    tab = ttk.Frame(session_notebook)
+    tab.columnconfigure(0, weight=1)
+    tab.rowconfigure(0, weight=1)
+    log_text = tk.Text(
+        tab,
+        height=43,
+        width=47,
+        font=custom_font,
+        bg="black",
+        fg="yellow green",
+    )
+    log_text.grid(row=0, column=0, padx=10, pady=0, sticky="nsew")
+    log_text.tag_configure("removed", elide=True)
+    log_text.tag_configure("duplicate", foreground="orange")
+    log_text.bind(right_click, show_event_log_menu)
+    log_scrollbar = ttk.Scrollbar(tab, orient="vertical", command=log_text.yview)
+    log_scrollbar.grid(row=0, column=1, sticky="ns")
+    log_text["yscrollcommand"] = log_scrollbar.set
+    session.event_store.add_listener(update_event_log_text)
+
+    game_sessions[str(tab)] = (session, log_text)
+    session_notebook.add(tab, text=session.title())
+    session_notebook.select(tab)
+    select_game_session()
+
+
+def select_game_session(event=None):
+    # Switching tabs only repoints the globals; every game keeps its widgets and events
+    global current_session, game_info, event_store, event_log_text
+    tab = session_notebook.select()
+    if tab not in game_sessions:  # The tab is being closed
+        return
+    current_session, event_log_text = game_sessions[tab]
+    game_info = current_session.game_info
+    event_store = current_session.event_store
+    show_game_info()
+    update_box_score()
+
+
+def close_game_session():
+    if len(event_store) and not game_info:
+        if not messagebox.askyesno("Confirmation", "Close this game? Its events have not been saved."):
+            return
+    elif len(event_store):
+        game_writer.save(game_info, event_store.snapshot().ordered())
+
+    tab = session_notebook.select()
+    del game_sessions[tab]
+    session_notebook.forget(tab)
+    root.nametowidget(tab).destroy()
+    if game_sessions:
+        select_game_session()
+    else:
+        new_game_session()
 
 
-def load_workbook_template(path):
-    if not os.path.exists(path):
-        raise FileNotFoundError("Excel template file not found.")
-    return load_workbook(path)
+def show_previous_games():
+    # Only the headers are read here; a game's events are loaded when it is opened
+    try:
+        games_catalog.refresh()
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Previous Games", str(e))
+        return
+    show_games_window(
+        "Previous Games",
+        games_catalog.headers(),
+        lambda game_id: (games_catalog.header(game_id), games_catalog.load(game_id)),
+        lambda game_id: games_catalog.page(game_id, 0, game_preview_events),
+    )
+
 
+def archive_season():
+    # Append every saved game that isn't archived yet to a season archive
+    archive_path = filedialog.asksaveasfilename(
+        title="Archive Season",
+        defaultextension=".zip",
+        filetypes=[("Season archives", "*.zip")],
+        confirmoverwrite=False,
+    )
+    if not archive_path:
+        return
+    try:
+        games_catalog.refresh()
+        results = {ADDED: [], ALREADY_ARCHIVED: [], CHANGED: []}
+        for game_id, header in games_catalog.headers():
+            result = append_game(archive_path, game_id, header, games_catalog.iter_rows(game_id))
+            results[result].append(game_id)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        messagebox.showerror("Archive Error", str(e))
+        return
+    export_status_label.config(
+        text=f"Archived {len(results[ADDED])} game(s), {len(results[ALREADY_ARCHIVED])} already in "
+        f"{os.path.basename(archive_path)}, {len(results[CHANGED])} changed since archived"
+    )
+    # A game saved again after it was archived can't be replaced inside the zip
+    if results[CHANGED]:
+        messagebox.showwarning(
+            "Archive Season",
+            "These games changed after they were archived and were skipped. "
+            "Archive the season into a new archive to include the updated games:\n\n"
+            + "\n".join(results[CHANGED]),
+        )
 
-def fill_sheet_with_data(sheet, data):
-    start_row = sheet.max_row + 1
-    for entry in data:
-        for col_idx, value in enumerate(entry, start=1):
-            sheet.cell(row=start_row, column=col_idx, value=value)
-        start_row += 1
 
-def save_and_open_workbook(workbook, path):
-    workbook.save(path)
+def show_archived_games():
+    archive_path = filedialog.askopenfilename(
+        title="Open Season Archive", filetypes=[("Season archives", "*.zip")]
+    )
+    if not archive_path:
+        return
     try:
-        webbrowser.open(path)
-    except Exception as e:
-        raise Exception(f"Unable to open the Excel file: {e}")
+        games = read_index(archive_path)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        messagebox.showerror("Open Error", str(e))
+        return
+    show_games_window(
+        f"Games in {os.path.basename(archive_path)}",
+        games,
+        lambda game_id: read_game(archive_path, game_id),
+    )
+
+
+def open_exported_workbook():
+    # Load a game back from a workbook this app (or an older version of it) exported
+    path = filedialog.askopenfilename(title="Open Exported Workbook", filetypes=[("Excel workbooks", "*.xlsx")])
+    if not path:
+        return
+    open_game(os.path.basename(path), lambda game_id: read_workbook_game(path))
+
+
+def upgrade_season_archive():
+    # Older archives stay readable; this writes a copy in the current event schema
+    source_path = filedialog.askopenfilename(
+        title="Select Season Archive to Upgrade", filetypes=[("Season archives", "*.zip")]
+    )
+    if not source_path:
+        return
+    target_path = filedialog.asksaveasfilename(
+        title="Save Upgraded Archive As", defaultextension=".zip", filetypes=[("Season archives", "*.zip")]
+    )
+    if not target_path:
+        return
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        messagebox.showerror("Upgrade Error", "Save the upgraded archive under a different name.")
+        return
+    try:
+        migrate_archive(source_path, target_path)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        messagebox.showerror("Upgrade Error", str(e))
+        return
+    export_status_label.config(text=f"Upgraded archive saved to {os.path.basename(target_path)}")
+
+
+def show_games_window(title, games, read_game_body, read_game_preview=None):
+    # read_game_preview(game_id), if given, returns the first few rows of a game, which are
+    # shown when it is selected without loading the whole game
+    games_window = tk.Toplevel(root)
+    games_window.title(title)
+    games_listbox = tk.Listbox(games_window, height=20, width=60, font=custom_font)
+    games_listbox.pack(fill="both", expand=True)
+    for game_id, header in games:
+        games_listbox.insert(
+            tk.END,
+            f"  {header['date']}  {header['opponent']}  {header['location']}  ({header['event_count']} events)",
+        )
+
+    def on_open(event=None):
+        selected_index = games_listbox.curselection()
+        if selected_index:
+            games_window.destroy()
+            open_game(games[selected_index[0]][0], read_game_body)
+
+    games_listbox.bind("<Double-Button-1>", on_open)
+    games_listbox.bind("<Return>", on_open)
+
+    if read_game_preview is not None:
+        preview_label = ttk.Label(games_window, text="", font=custom_font, justify="left")
+        preview_label.pack(fill="x", padx=10, pady=5)
+
+        def on_select(event=None):
+            selected_index = games_listbox.curselection()
+            if not selected_index:
+                return
+            try:
+                rows = read_game_preview(games[selected_index[0]][0])
+            except (OSError, ValueError) as e:
+                preview_label.config(text=str(e))
+                return
+            preview_label.config(text="".join(format_event_line(row) for row in rows).rstrip("\n"))
+
+        games_listbox.bind("<<ListboxSelect>>", on_select)
+
 
 def export_game_data_to_excel():
+    global export_cancel_event
+    if export_cancel_event is not None:
+        export_status_label.config(text="An export is already running")
+        return
     try:
-        opponent_without_spaces = game_info["opponent"].replace(" ", "_")
         desktop_path = os.path.expanduser("~/Desktop/Stat Tracker App")
-        template_path = "../data/CSV to XL MASTER v3.xlsx"
-        workbook = load_workbook_template(template_path)
 
-        if "Raw Data" not in workbook.sheetnames:
-            export_status_label.config(
-                text="Error: 'Raw Data' sheet not found in the template."
-            )
+        # Skip files whose content is already exported and never overwrite another game's file
+        snapshot = event_store.snapshot()
+        content_hash = game_content_hash(game_info, snapshot.ordered())
+        excel_filename, unchanged = plan_export("../output", game_info, content_hash)
+        targets = {} if unchanged else {"xlsx": excel_filename}
+        for format, selected in extra_export_formats.items():
+            if selected.get():
+                path, unchanged = plan_export("../output", game_info, content_hash, f".{format}")
+                if not unchanged:
+                    targets[format] = path
+        if not targets:
+            export_status_label.config(text=f"No changes since the last export to {excel_filename}")
             return
+    except Exception as e:
+        export_status_label.config(text=str(e))
+        return
 
-        sheet = workbook["Raw Data"]
-        fill_sheet_with_data(sheet, event_log)
+    # The files are written from the snapshot on a worker thread while logging continues
+    export_game_info = dict(game_info)
+    game_writer.save(export_game_info, snapshot.ordered())
+    export_cancel_event = threading.Event()
+    export_button.config(text="Cancel Export", command=cancel_export)
+    threading.Thread(
+        target=run_export,
+        args=(snapshot, export_game_info, content_hash, targets, export_cancel_event),
+        daemon=True,
+    ).start()
 
-        excel_filename = os.path.join(
-            "../output", f"{game_info['date']}_{opponent_without_spaces}.xlsx"
-        )
-        save_and_open_workbook(workbook, excel_filename)
-        export_status_label.config(
-            text=f"Game data exported to Excel at {excel_filename}"
-        )
 
+def run_export(snapshot, export_game_info, content_hash, targets, cancel_event):
+    # Runs on the export thread; every GUI update goes through gui_update_queue
+    rows = list(snapshot.ordered())
+
+    def report(text):
+        gui_update_queue.put(lambda: export_status_label.config(text=text))
+
+    def progress(done, total):
+        report(f"Exporting {done} of {total} events..." if done < total else "Saving workbook...")
+
+    try:
+        # Every requested file is written from one pass over the events
+        export_files(export_game_info, content_hash, rows, targets, progress=progress, cancel_event=cancel_event)
+        report(f"Game data exported to {', '.join(targets.values())}")
+        if "xlsx" in targets:
+            open_workbook(targets["xlsx"])
+    except ExportCancelled:
+        report("Export cancelled")
     except FileNotFoundError as e:
-        export_status_label.config(text=str(e))
+        report(str(e))
     except PermissionError:
-        export_status_label.config(text="Error: Permission denied for file operations.")
+        report("Error: Permission denied for file operations.")
     except Exception as e:
-        export_status_label.config(text=str(e))
+        report(str(e))
+    finally:
+        gui_update_queue.put(finish_export)
+
+
+def cancel_export():
+    if export_cancel_event is not None:
+        export_cancel_event.set()
+        export_status_label.config(text="Cancelling export...")
+
+
+def finish_export():
+    global export_cancel_event
+    export_cancel_event = None
+    export_button.config(text="Export Game Data", command=confirm_export)
 
 def simulate_enter_key():
     event = tk.Event()
@@ -434,6 +1046,8 @@ def confirm_quit():
     response = messagebox.askyesno("Confirmation", "Are you sure you want to quit?")
     if response:
         stop_threads = True  # Signal threads to stop
+        save_open_games()  # Save what was logged since the last autosave
+        game_writer.wait()  # Finish saving any queued games
         root.destroy()  # Close the main window
 
 
@@ -506,6 +1120,45 @@ style.configure("TButton", font=medium_font)
 # Entry width for input fields
 entry_width = 10
 
+# Menu bar
+menu_bar = tk.Menu(root)
+file_menu = tk.Menu(menu_bar, tearoff=0)
+file_menu.add_command(label="New Game Tab", command=new_game_session)
+file_menu.add_command(label="Close Game Tab", command=close_game_session)
+file_menu.add_separator()
+file_menu.add_command(label="Previous Games...", command=show_previous_games)
+file_menu.add_command(label="Save Game", command=save_current_game)
+file_menu.add_command(label="Archive Season...", command=archive_season)
+file_menu.add_command(label="Open Archived Game...", command=show_archived_games)
+file_menu.add_command(label="Open Exported Workbook...", command=open_exported_workbook)
+file_menu.add_command(label="Upgrade Season Archive...", command=upgrade_season_archive)
+file_menu.add_separator()
+file_menu.add_command(label="Import Events...", command=import_events)
+file_menu.add_command(label="Export Events...", command=export_events_file)
+# Event files written next to the workbook by every export
+extra_export_formats = {format: tk.BooleanVar(value=False) for format in EVENT_EXPORT_FORMATS}
+also_export_menu = tk.Menu(file_menu, tearoff=0)
+for format, selected in extra_export_formats.items():
+    also_export_menu.add_checkbutton(label=format.upper(), variable=selected)
+file_menu.add_cascade(label="Also Export", menu=also_export_menu)
+file_menu.add_command(label="Merge Event Logs...", command=merge_event_log_files)
+file_menu.add_command(
+    label="Merge Event Logs with Base...", command=lambda: merge_event_log_files(with_base=True)
+)
+menu_bar.add_cascade(label="File", menu=file_menu)
+command_key = "Command" if root.tk.call("tk", "windowingsystem") == "aqua" else "Control"
+edit_menu = tk.Menu(menu_bar, tearoff=0, postcommand=update_edit_menu)
+edit_menu.add_command(label="Undo", command=undo_event, accelerator=f"{command_key}+Z")
+edit_menu.add_command(label="Redo", command=redo_event, accelerator=f"{command_key}+Shift+Z")
+edit_menu.add_separator()
+edit_menu.add_command(label="Find and Correct Events...", command=show_find_events)
+edit_menu.add_command(label="Duplicate Report...", command=show_duplicate_report)
+edit_menu.add_command(label="Box Score...", command=show_box_score)
+menu_bar.add_cascade(label="Edit", menu=edit_menu)
+root.config(menu=menu_bar)
+root.bind_all(f"<{command_key}-z>", undo_event)
+root.bind_all(f"<{command_key}-Z>", redo_event)
+
 # ================================ LEFT FRAME SETUP ==============================
 frame_left = ttk.Frame(root, borderwidth=2, relief="solid")
 frame_left.grid(column=0, row=0, padx=10, pady=10, sticky="n")
@@ -764,32 +1417,42 @@ event_log_frame.grid(column=0, row=1, columnspan=1)
 event_log_frame.columnconfigure(0, weight=1)
 event_log_frame.rowconfigure(0, weight=1)
 custom_font = ("Courier", 14)
-event_log_text = tk.Text(
-    event_log_frame,
-    height=43,
-    width=47,
-    font=custom_font,
-    bg="black",
-    fg="yellow green",
-)
-event_log_text.grid(row=0, column=0, padx=10, pady=0, sticky="nsew")
 
-# Create a Scrollbar and set its command to the Text widget's yview
-scrollbar = ttk.Scrollbar(
-    event_log_frame, orient="vertical", command=event_log_text.yview
-)
-scrollbar.grid(row=0, column=1, sticky="ns")
-event_log_text["yscrollcommand"] = scrollbar.set
+# One tab per open game, each with its own Event Log
+session_notebook = ttk.Notebook(event_log_frame)
+session_notebook.grid(row=0, column=0, sticky="nsew")
+session_notebook.bind("<<NotebookTabChanged>>", select_game_session)
+
+# Right-click menu for removing a single logged event
+event_log_menu = tk.Menu(root, tearoff=0)
+event_log_menu.add_command(label="Delete Event")
+right_click = "<Button-2>" if command_key == "Command" else "<Button-3>"
 
 # Create export status label within event log frame
 export_status_label = ttk.Label(event_log_frame, text="", font=custom_font)
 export_status_label.grid(row=1, column=0, padx=10, sticky="nsew")
 
+# Start with one empty game; one writer saves every game in the background
+game_writer = GameWriter(GAMES_DIRECTORY, on_error=report_autosave_error)
+new_game_session()
+
+# Upgrade games saved by older versions, so Previous Games and the archive read the current schema
+try:
+    upgraded_games = migrate_games_directory(GAMES_DIRECTORY)
+except (OSError, ValueError) as e:
+    export_status_label.config(text=f"Saved games could not be upgraded: {e}")
+else:
+    if upgraded_games:
+        export_status_label.config(text=f"Upgraded {upgraded_games} saved game(s) to the current format")
+
 # Starting the thread
 threading.Thread(target=update_timecode, daemon=False).start()
 
 # Start the process_gui_updates function
 root.after(100, process_gui_updates)
 
+# Start saving the game in the background
+root.after(autosave_interval_ms, autosave_game)
+
 # Start the main GUI loop
 root.mainloop()
@@ -0,0 +1,203 @@
+# Streaming event exports for analysis tools: NDJSON and CSV records with typed fields, and
+# an HTML table for reading in a browser
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from event_store import PLAYER_NUMBER, VIDEO_TIME, video_time_seconds
+
+# Record fields in row order; the video time is exported in milliseconds
+RECORD_FIELDS = [
+    "date",
+    "start_time",
+    "location",
+    "opponent",
+    "quarter",
+    "video_time_ms",
+    "player_number",
+    "first_name",
+    "last_name",
+    "description",
+    "event_code",
+]
+
+EVENT_EXPORT_FORMATS = ("ndjson", "csv", "html")
+
+# Columns of the HTML table: (heading, record field)
+HTML_COLUMNS = [
+    ("Quarter", "quarter"),
+    ("Video Time", "video_time_ms"),
+    ("#", "player_number"),
+    ("First", "first_name"),
+    ("Last", "last_name"),
+    ("Event", "description"),
+    ("Code", "event_code"),
+]
+
+
+def event_record(row):
+    """Return an event row as a typed record: video time in milliseconds, player as a number."""
+    values = list(row)
+    values[VIDEO_TIME] = video_time_seconds(row[VIDEO_TIME]) * 1000
+    values[PLAYER_NUMBER] = int(row[PLAYER_NUMBER])
+    return dict(zip(RECORD_FIELDS, values))
+
+
+def typed_record(values):
+    """Return the record of an event already converted to typed cell values by excel_row."""
+    record = dict(zip(RECORD_FIELDS, values))
+    record["video_time_ms"] = values[VIDEO_TIME] // datetime.timedelta(milliseconds=1)
+    return record
+
+
+def event_records(rows):
+    """Yield the typed record of each event row."""
+    for row in rows:
+        yield event_record(row)
+
+
+def ndjson_lines(rows):
+    """Yield one JSON object line per event."""
+    return _ndjson_lines(event_records(rows))
+
+
+def csv_lines(rows):
+    """Yield a header line, then one CSV line per event."""
+    return _csv_lines(event_records(rows))
+
+
+def html_lines(rows):
+    """Yield an HTML page with a table of the events, one line per event."""
+    return _html_lines(event_records(rows))
+
+
+def _ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def _csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    yield ",".join(RECORD_FIELDS) + "\n"
+    for record in records:
+        writer.writerow(record.values())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _html_lines(records):
+    # The page is titled after the game of the first event
+    records = iter(records)
+    first = next(records, None)
+    title = "Events"
+    if first is not None:
+        title = escape(" ".join(first[field] for field in ("date", "start_time", "opponent", "location")))
+        records = chain([first], records)
+    yield f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{title}</title></head><body>\n'
+    head = "".join(f"<th>{heading}</th>" for heading, field in HTML_COLUMNS)
+    yield f"<h1>{title}</h1>\n<table>\n<tr>{head}</tr>\n"
+    for record in records:
+        seconds = record["video_time_ms"] // 1000
+        cells = [escape(str(record[field])) for heading, field in HTML_COLUMNS]
+        cells[1] = f"{seconds // 60:02}:{seconds % 60:02}"
+        yield "<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>\n"
+    yield "</table>\n</body></html>\n"
+
+
+RECORD_LINES = {"ndjson": _ndjson_lines, "csv": _csv_lines, "html": _html_lines}
+
+
+def event_file_format(path):
+    """Return the export format of a file name such as game.csv or game.ndjson.gz."""
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension == "jsonl":
+        extension = "ndjson"
+    if extension not in RECORD_LINES:
+        raise ValueError(f"Unsupported event export format: {os.path.basename(path)}")
+    return extension
+
+
+def record_row(record):
+    """Turn an exported record back into an event row of text fields."""
+    row = [str(record[field]) for field in RECORD_FIELDS]
+    seconds = int(record["video_time_ms"]) // 1000
+    row[VIDEO_TIME] = f"{seconds // 60:02}:{seconds % 60:02}"
+    return tuple(row)
+
+
+def read_event_file(path):
+    """Yield the event rows of an NDJSON or CSV export, gzip-compressed or not."""
+    format = event_file_format(path)
+    if format == "html":
+        raise ValueError(f"HTML exports can't be read back: {os.path.basename(path)}")
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as file:
+        if format == "csv":
+            records = csv.DictReader(file)
+        else:
+            records = (json.loads(line) for line in file if line.strip())
+        try:
+            for record in records:
+                yield record_row(record)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"{os.path.basename(path)} is not an event export (missing {e}).")
+
+
+def is_event_export(path):
+    """Return True if path is an NDJSON or CSV file written by write_event_file."""
+    try:
+        format = event_file_format(path)
+    except ValueError:
+        return False
+    if format == "html":
+        return False
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as file:
+        first_line = file.readline().strip()
+    if format == "csv":
+        return first_line == ",".join(RECORD_FIELDS)
+    return '"video_time_ms"' in first_line  # Saved games are JSON lines too, headed by the game
+
+
+def write_event_file(rows, path, format=None):
+    """Stream event rows to path as NDJSON, CSV or HTML, gzip-compressed if the name ends in .gz.
+
+    The format comes from the file extension unless given. Rows are written one at a
+    time, so memory use doesn't grow with the game. Returns the number of events written.
+    """
+    return write_record_file(event_records(rows), path, format)
+
+
+def write_record_file(records, path, format=None):
+    """Write event records (see event_record) to path like write_event_file."""
+    format = format or event_file_format(path)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    temp_path = f"{path}.tmp"
+    if path.endswith(".gz"):
+        file = gzip.open(temp_path, "wt", encoding="utf-8", newline="")
+    else:
+        file = open(temp_path, "w", encoding="utf-8", newline="")
+    try:
+        with file:
+            file.writelines(RECORD_LINES[format](counted()))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return count
@@ -0,0 +1,129 @@
+# Bulk event import for transcribed scoresheets and logs from other tools
+
+import csv
+import os
+
+import pandas as pd
+
+from config import team_roster, event_codes
+from event_export import is_event_export, read_event_file as read_exported_events
+from event_schema import read_game_lines
+
+# Column order expected in an import file; the quarter column is optional
+IMPORT_COLUMNS = ["video_time", "player_number", "event_code", "quarter"]
+
+
+def read_event_file(path):
+    """Read a CSV/TSV event file into a DataFrame of stripped strings indexed by file line number."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Import file not found: {path}")
+
+    separator = "\t" if os.path.splitext(path)[1].lower() in (".tsv", ".tab") else ","
+
+    # Name every column of the widest row, so rows with extra fields can be reported
+    # instead of being taken as an index column
+    with open(path, encoding="utf-8", newline="") as file:
+        width = max((len(fields) for fields in csv.reader(file, delimiter=separator)), default=0)
+    extra_columns = [f"extra_{number}" for number in range(1, width - len(IMPORT_COLUMNS) + 1)]
+    frame = pd.read_csv(
+        path,
+        sep=separator,
+        header=None,
+        names=IMPORT_COLUMNS + extra_columns,
+        index_col=False,
+        dtype=str,
+        keep_default_na=False,
+        skip_blank_lines=False,
+    )
+    frame = frame.fillna("").apply(lambda column: column.str.strip())
+    frame.index = frame.index + 1  # Report rows by their line number in the file
+
+    # Drop blank lines and an optional header row
+    frame = frame[(frame != "").any(axis=1)]
+    if len(frame) and not any(ch.isdigit() for ch in "".join(frame.iloc[0][:2])):
+        frame = frame.iloc[1:]
+    return frame
+
+
+def validate_event_frame(frame):
+    """Validate every row at once and return (valid_mask, error_messages)."""
+    video_time = frame["video_time"]
+    player_numbers = pd.to_numeric(frame["player_number"].str.lstrip("#"), errors="coerce")
+    event_code = frame["event_code"]
+
+    bad_time = ~video_time.str.fullmatch(r"\d{2}:\d{2}")
+    bad_player = ~player_numbers.isin(list(team_roster))
+    bad_code = ~event_code.isin(list(event_codes))
+    extra_fields = frame[frame.columns[len(IMPORT_COLUMNS) :]]
+    bad_extra = (extra_fields != "").any(axis=1)  # An empty trailing field is allowed
+
+    errors = []
+    for row_number in frame.index[bad_time | bad_player | bad_code | bad_extra]:
+        problems = []
+        if bad_time[row_number]:
+            problems.append(f"invalid video time '{video_time[row_number]}' (use MM:SS)")
+        if bad_player[row_number]:
+            problems.append(f"invalid player number '{frame['player_number'][row_number]}'")
+        if bad_code[row_number]:
+            problems.append(f"invalid event code '{event_code[row_number]}'")
+        if bad_extra[row_number]:
+            problems.append("unexpected extra column(s) after the quarter")
+        errors.append(f"Row {row_number}: " + ", ".join(problems))
+
+    return ~(bad_time | bad_player | bad_code | bad_extra), errors
+
+
+def import_event_file(path, game_info):
+    """Load an event file and return (rows, errors); rows use the same layout as add_event."""
+    frame = read_event_file(path)
+    valid, errors = validate_event_frame(frame)
+    frame = frame[valid]
+
+    player_numbers = pd.to_numeric(frame["player_number"].str.lstrip("#")).astype(int)
+    first_names = player_numbers.map({number: names[0] for number, names in team_roster.items()})
+    last_names = player_numbers.map({number: names[1] for number, names in team_roster.items()})
+    descriptions = frame["event_code"].map(event_codes)
+    quarters = frame["quarter"].where(frame["quarter"] != "", game_info["quarter"])
+
+    rows = [
+        [
+            game_info["date"],
+            game_info["start_time"],
+            game_info["location"],
+            game_info["opponent"],
+            quarter,
+            video_time,
+            str(player_number),
+            first_name,
+            last_name,
+            description,
+            event_code,
+        ]
+        for quarter, video_time, player_number, first_name, last_name, description, event_code in zip(
+            quarters,
+            frame["video_time"],
+            player_numbers,
+            first_names,
+            last_names,
+            descriptions,
+            frame["event_code"],
+        )
+    ]
+    return rows, errors
+
+
+def read_event_log(path, game_info):
+    """Read another operator's log of a game and return (rows, errors).
+
+    The log can be a saved game (.jsonl), an NDJSON or CSV event export, or an import
+    file in the video time, player, code[, quarter] layout.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Event log not found: {path}")
+    if is_event_export(path):
+        return list(read_exported_events(path)), []
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as file:
+            header, rows = read_game_lines(file)
+            return list(rows), []
+    return import_event_file(path, game_info)
@@ -0,0 +1,105 @@
+# Merge event logs recorded by independent operators for the same game
+
+import heapq
+from collections import Counter
+
+from event_store import (
+    DUPLICATE_WINDOW_SECONDS,
+    EVENT_CODE,
+    PLAYER_NUMBER,
+    VIDEO_TIME,
+    video_time_seconds,
+)
+
+
+def _tagged(rows, source):
+    # Timsort is linear on the already time-ordered logs the app writes
+    keyed = ((video_time_seconds(row[VIDEO_TIME]), row) for row in rows)
+    for seconds, row in sorted(keyed, key=lambda item: item[0]):
+        yield seconds, source, row
+
+
+def _matches(merged_rows, tolerance):
+    # Group the merged stream per (player, code): a match is a run of rows with the same
+    # key within tolerance of the match's first row, whatever else was logged around them
+    open_matches = {}  # key -> rows of the key's current match
+    for seconds, source, row in merged_rows:
+        key = (row[PLAYER_NUMBER], row[EVENT_CODE])
+        match = open_matches.get(key)
+        if match and seconds - match[0][0] > tolerance:
+            yield key, match
+            match = None
+        if not match:
+            match = open_matches[key] = []
+        match.append((seconds, source, row))
+    yield from open_matches.items()
+
+
+def _conflicts(added, tolerance):
+    # Join matches added by different operators that are within tolerance of each other and
+    # share a player or a code; each group of joined matches is one conflict
+    added.sort(key=lambda match: match[0])
+    group_of = list(range(len(added)))
+
+    def group(index):
+        while group_of[index] != index:
+            group_of[index] = group_of[group_of[index]]
+            index = group_of[index]
+        return index
+
+    for index, (seconds, key, sources, rows) in enumerate(added):
+        for other in range(index - 1, -1, -1):
+            other_seconds, other_key, other_sources, other_rows = added[other]
+            if seconds - other_seconds > tolerance:
+                break
+            if (key[0] == other_key[0] or key[1] == other_key[1]) and not (sources & other_sources):
+                group_of[group(index)] = group(other)
+
+    groups = {}
+    for index, (seconds, key, sources, rows) in enumerate(added):
+        groups.setdefault(group(index), []).append(index)
+    conflicts = []
+    for indexes in groups.values():
+        if len(indexes) > 1:
+            rows = sorted((row for index in indexes for row in added[index][3]), key=lambda item: item[0])
+            conflicts.append([row for seconds, row in rows])
+    conflicts.sort(key=lambda rows: video_time_seconds(rows[0][VIDEO_TIME]))
+    return conflicts
+
+
+def merge_event_logs(streams, base=None, tolerance=DUPLICATE_WINDOW_SECONDS):
+    """Merge event logs of the same game into one and return (rows, conflicts).
+
+    The logs are aligned by video time with a sort-merge join. The same player and event
+    code logged by more than one operator within tolerance seconds is kept once. With a
+    common base log, an event removed by any operator is dropped and an event added by
+    several operators is added once.
+
+    A conflict is a set of different events from different operators within tolerance
+    seconds that share a player or an event code (for example the same rebound credited
+    to two players). Every conflicting event is kept in the merged rows and each conflict
+    is reported as the list of rows involved.
+    """
+    sources = [_tagged(rows, source) for source, rows in enumerate(streams)]
+    if base is not None:
+        sources.append(_tagged(base, -1))
+
+    merged = []
+    added = []  # (seconds, key, operators, [(seconds, row), ...]) of matches beyond the base
+    for key, match in _matches(heapq.merge(*sources, key=lambda item: item[0]), tolerance):
+        counts = Counter(source for seconds, source, row in match)
+        base_count = counts.pop(-1, 0)
+        deltas = [counts[source] - base_count for source in range(len(streams))]
+        total = base_count + max([0] + deltas) + min([0] + deltas)
+        # Keep the times of the operator who logged the most of these, the first log on a tie
+        kept = max(range(len(streams)), key=lambda source: (counts[source], -source))
+        match_rows = sorted(match, key=lambda item: item[1] != kept)
+        merged.extend((seconds, row) for seconds, source, row in match_rows[:total])
+        operators = {source for source in counts if counts[source] > base_count}
+        if operators:
+            rows = [(seconds, row) for seconds, source, row in match if source != -1]
+            added.append((match[0][0], key, operators, rows))
+
+    # Matches are finished out of time order, so put the kept rows back in it
+    merged.sort(key=lambda item: item[0])
+    return [row for seconds, row in merged], _conflicts(added, tolerance)
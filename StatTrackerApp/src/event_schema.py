@@ -0,0 +1,142 @@
+# Versioned on-disk format for saved events, with streaming migrations between versions
+#
+# A saved game is a stream of JSON lines: a header object, then one record per event.
+#   Version 1: header without "schema"; each record is the 11 positional fields of an
+#              event row (date, start time, venue, opponent, quarter, video time, player
+#              number, first name, last name, description, event code).
+#   Version 2: header has "schema": 2 and the game fields; each record is an object with
+#              named, typed fields. Game fields are only stored on a record when they
+#              differ from the header (e.g. after merging logs typed by different people).
+
+import hashlib
+import json
+import os
+
+from event_store import (
+    DATE,
+    DESCRIPTION,
+    EVENT_CODE,
+    FIRST_NAME,
+    LAST_NAME,
+    LOCATION,
+    OPPONENT,
+    PLAYER_NUMBER,
+    QUARTER,
+    START_TIME,
+    VIDEO_TIME,
+)
+
+SCHEMA_VERSION = 2
+
+# Header fields shared by every event of a game, and their positions in an event row
+GAME_FIELDS = {"date": DATE, "start_time": START_TIME, "location": LOCATION, "opponent": OPPONENT}
+
+# Record fields of the current schema and their positions in an event row
+EVENT_FIELDS = {
+    "quarter": QUARTER,
+    "video_time": VIDEO_TIME,
+    "player_number": PLAYER_NUMBER,
+    "first_name": FIRST_NAME,
+    "last_name": LAST_NAME,
+    "description": DESCRIPTION,
+    "event_code": EVENT_CODE,
+}
+
+
+def schema_version(header):
+    return header.get("schema", 1)
+
+
+def encode_row(header, row):
+    """Turn an event row into a current-schema record."""
+    record = {field: row[column] for field, column in EVENT_FIELDS.items()}
+    record["player_number"] = int(record["player_number"])
+    for field, column in GAME_FIELDS.items():
+        if row[column] != header.get(field):
+            record[field] = row[column]
+    return record
+
+
+def decode_record(header, record):
+    """Turn a current-schema record back into an event row."""
+    row = [None] * 11
+    for field, column in GAME_FIELDS.items():
+        row[column] = record.get(field, header.get(field))
+    for field, column in EVENT_FIELDS.items():
+        row[column] = record[field]
+    row[PLAYER_NUMBER] = str(row[PLAYER_NUMBER])
+    return tuple(row)
+
+
+def game_content_hash(game_info, rows):
+    """Hash a game's canonical event stream: its game fields and time-ordered records.
+
+    The hash only depends on what was logged, so it identifies a game's content no matter
+    when, where or how often it is saved or exported.
+    """
+    header = {field: game_info[field] for field in GAME_FIELDS}
+    digest = hashlib.sha256(json.dumps(header, sort_keys=True).encode("utf-8"))
+    for row in rows:
+        digest.update(b"\n")
+        digest.update(json.dumps(encode_row(header, row), sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ================================ MIGRATIONS ================================
+# Each migration takes (header, records) for one version and returns them for the next.
+# Records are transformed lazily, so a game is upgraded one record at a time.
+
+def _v1_to_v2(header, records):
+    header = dict(header, schema=2)
+    return header, (encode_row(header, row) for row in records)
+
+
+MIGRATIONS = {1: _v1_to_v2}
+
+
+def upgrade(header, records):
+    """Upgrade a header and an iterable of records to SCHEMA_VERSION, lazily."""
+    version = schema_version(header)
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"Saved events use schema version {version}, newer than this app's version {SCHEMA_VERSION}."
+        )
+    while version < SCHEMA_VERSION:
+        header, records = MIGRATIONS[version](header, records)
+        version = schema_version(header)
+    return header, records
+
+
+def read_game_lines(lines):
+    """Parse a saved game from JSON lines of any schema version and return (header, rows).
+
+    rows is a generator, so the events are only read and upgraded as they are consumed.
+    """
+    lines = iter(lines)
+    header, records = upgrade(json.loads(next(lines)), (json.loads(line) for line in lines))
+    return header, (decode_record(header, record) for record in records)
+
+
+def write_game_lines(header, rows):
+    """Yield the JSON lines of a game in the current schema."""
+    header = dict(header, schema=SCHEMA_VERSION)
+    yield json.dumps(header) + "\n"
+    for row in rows:
+        yield json.dumps(encode_row(header, row)) + "\n"
+
+
+def migrate_lines(lines):
+    """Yield a saved game's JSON lines upgraded to the current schema, in constant memory."""
+    lines = iter(lines)
+    header, records = upgrade(json.loads(next(lines)), (json.loads(line) for line in lines))
+    yield json.dumps(header) + "\n"
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def migrate_file(path):
+    """Upgrade a saved game file in place, streaming it through a temporary file."""
+    temp_path = path + ".tmp"
+    with open(path, encoding="utf-8") as source, open(temp_path, "w", encoding="utf-8") as target:
+        target.writelines(migrate_lines(source))
+    os.replace(temp_path, path)
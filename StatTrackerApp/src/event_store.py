@@ -0,0 +1,336 @@
+# Event store for the current game: an append-only log of event rows with undo/redo
+
+from bisect import bisect_right, insort
+from collections import Counter, defaultdict
+
+# Positions of the fields in an event row (the column order of the "Raw Data" sheet)
+(
+    DATE,
+    START_TIME,
+    LOCATION,
+    OPPONENT,
+    QUARTER,
+    VIDEO_TIME,
+    PLAYER_NUMBER,
+    FIRST_NAME,
+    LAST_NAME,
+    DESCRIPTION,
+    EVENT_CODE,
+) = range(11)
+
+# Row fields with an inverted index (postings of live event ids per value)
+POSTING_FIELDS = {"player_number": PLAYER_NUMBER, "event_code": EVENT_CODE, "quarter": QUARTER}
+
+# Events by the same player with the same code this close together are likely duplicates
+DUPLICATE_WINDOW_SECONDS = 2
+
+
+def video_time_seconds(video_time):
+    """Convert a "MM:SS" (or "H:MM:SS") video time to seconds."""
+    seconds = 0
+    for part in video_time.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def updated_row(row, roster, codes, player_number=None, event_code=None, video_time=None):
+    """Return a copy of row with a new player, event code and/or video time.
+
+    Player names and the event description are looked up again so the row stays consistent.
+    """
+    row = list(row)
+    if player_number is not None:
+        if int(player_number) not in roster:
+            raise ValueError(f"Player number {player_number} is not valid.")
+        row[PLAYER_NUMBER] = str(int(player_number))
+        row[FIRST_NAME], row[LAST_NAME] = roster[int(player_number)][:2]
+    if event_code is not None:
+        if event_code not in codes:
+            raise ValueError(f"Event code '{event_code}' is not valid.")
+        row[EVENT_CODE] = event_code
+        row[DESCRIPTION] = codes[event_code]
+    if video_time is not None:
+        try:
+            seconds = video_time_seconds(video_time)
+        except ValueError:
+            raise ValueError(f"Video time '{video_time}' is not valid. Use 'MM:SS'.")
+        row[VIDEO_TIME] = f"{seconds // 60:02}:{seconds % 60:02}"
+    return tuple(row)
+
+
+class EventView:
+    """Read access shared by the live event store and its snapshots."""
+
+    def _size(self):
+        return len(self._rows)
+
+    def __len__(self):
+        return self._size() - len(self._removed)
+
+    def __iter__(self):
+        for event_id, row in self.items():
+            yield row
+
+    def items(self):
+        """Yield (event_id, row) for every live event in entry order."""
+        for event_id in range(self._size()):
+            if event_id not in self._removed:
+                yield event_id, self._rows[event_id]
+
+    def ordered_items(self):
+        """Yield (event_id, row) for every live event in video time order."""
+        for seconds, event_id in self._timeline:
+            if event_id not in self._removed:
+                yield event_id, self._rows[event_id]
+
+    def ordered(self):
+        """Yield live rows in video time order, ready for views and exports."""
+        for event_id, row in self.ordered_items():
+            yield row
+
+    def get(self, event_id):
+        return self._rows[event_id]
+
+
+class EventSnapshot(EventView):
+    """Immutable view of the event store at one moment.
+
+    It shares the store's row list (rows are only ever appended, never changed) and its
+    tombstone set and timeline, which the store copies before its next change. Taking a
+    snapshot is O(1) and reading one from another thread needs no lock.
+    """
+
+    def __init__(self, rows, removed, timeline, version):
+        self._rows = rows
+        self._length = len(rows)
+        self._removed = removed
+        self._timeline = timeline
+        self.version = version
+
+    def _size(self):
+        return self._length
+
+
+class EventStore(EventView):
+    """Append-only log of event rows addressed by event id.
+
+    Rows are never moved or overwritten. Removing an event only tombstones its id and
+    undo/redo flip tombstones back and forth, so every operation touches a single id
+    and listeners can patch just the affected line of a view.
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self.version = 0  # Bumped on every change, so readers can tell whether the log changed
+        self.clear()
+
+    def add_listener(self, listener):
+        """Register listener(changes), called with [(action, event_id), ...] after every change.
+
+        Actions are "add", "remove" and "restore".
+        """
+        self._listeners.append(listener)
+
+    def snapshot(self):
+        """Return an EventSnapshot of the current log for background readers."""
+        self._shared = True
+        return EventSnapshot(self._rows, self._removed, self._timeline, self.version)
+
+    def time_key(self, event_id):
+        return (video_time_seconds(self._rows[event_id][VIDEO_TIME]), event_id)
+
+    def next_in_time(self, event_id):
+        """Return the id that follows event_id in video time order (removed ids included), or None."""
+        position = bisect_right(self._timeline, self.time_key(event_id))
+        if position < len(self._timeline):
+            return self._timeline[position][1]
+        return None
+
+    def find_duplicates(self, event_id):
+        """Return the other live events that look like a double entry of event_id."""
+        seconds, (bucket, player_number, event_code) = self._duplicate_key(event_id)
+        duplicates = []
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            for other_id in self._duplicate_index.get((neighbour, player_number, event_code), ()):
+                gap = abs(self.time_key(other_id)[0] - seconds)
+                if other_id != event_id and gap <= DUPLICATE_WINDOW_SECONDS:
+                    duplicates.append(other_id)
+        return sorted(duplicates)
+
+    def duplicate_report(self):
+        """Group every live event that has likely duplicates, in video time order."""
+        report = []
+        seen = set()
+        for event_id, row in self.ordered_items():
+            if event_id in seen:
+                continue
+            group = [event_id] + self.find_duplicates(event_id)
+            if len(group) > 1:
+                seen.update(group)
+                report.append(sorted(group, key=self.time_key))
+        return report
+
+    def select(self, **criteria):
+        """Return the ids of live events matching every field=value given, in video time order.
+
+        Fields are those in POSTING_FIELDS, e.g. select(player_number="11", event_code="t").
+        The postings of each value are intersected smallest first instead of scanning rows.
+        """
+        postings = []
+        for field, value in criteria.items():
+            if field not in POSTING_FIELDS:
+                raise ValueError(f"Events cannot be selected by '{field}'.")
+            if value is not None:
+                postings.append(self._postings[field].get(value, set()))
+        if not postings:
+            return [event_id for event_id, row in self.ordered_items()]
+
+        postings.sort(key=len)
+        selected = set(postings[0]).intersection(*postings[1:])
+        return sorted(selected, key=self.time_key)
+
+    def is_live(self, event_id):
+        return 0 <= event_id < len(self._rows) and event_id not in self._removed
+
+    # ---------------------------------------------------------------- operations
+    def add(self, row):
+        return self.extend([row])[0]
+
+    def extend(self, rows):
+        """Append rows as one undoable operation and return their event ids."""
+        first_id = len(self._rows)
+        self._do([("add", tuple(row)) for row in rows])
+        return list(range(first_id, len(self._rows)))
+
+    def replace_all(self, rows):
+        """Swap every live event for rows as one undoable operation (used after a merge)."""
+        changes = [("remove", event_id) for event_id, row in self.items()]
+        self._do(changes + [("add", tuple(row)) for row in rows])
+
+    def edit(self, event_ids, update):
+        """Replace each event with update(row) as one undoable operation and return the new ids.
+
+        An edit tombstones the old row and appends the new one, so only the edited events'
+        contributions to the totals and indexes change and views repaint just those lines.
+        """
+        changes = []
+        for event_id in event_ids:
+            if not self.is_live(event_id):
+                raise ValueError(f"Event {event_id} is not in the log.")
+            new_row = tuple(update(self._rows[event_id]))
+            if new_row != self._rows[event_id]:
+                changes += [("add", new_row), ("remove", event_id)]
+        first_id = len(self._rows)
+        self._do(changes)
+        return list(range(first_id, len(self._rows)))
+
+    def edit_where(self, update, predicate=None, **criteria):
+        """Edit every live event selected by select(**criteria) and, if given, predicate(row)."""
+        event_ids = self.select(**criteria)
+        if predicate is not None:
+            event_ids = [event_id for event_id in event_ids if predicate(self._rows[event_id])]
+        return self.edit(event_ids, update)
+
+    def remove(self, event_ids):
+        """Tombstone the given live events as one undoable operation."""
+        for event_id in event_ids:
+            if not self.is_live(event_id):
+                raise ValueError(f"Event {event_id} is not in the log.")
+        self._do([("remove", event_id) for event_id in event_ids])
+
+    def can_undo(self):
+        return bool(self._undo_stack)
+
+    def can_redo(self):
+        return bool(self._redo_stack)
+
+    def undo(self):
+        if not self._undo_stack:
+            return False
+        self._redo_stack.append(self._apply(self._undo_stack.pop()))
+        return True
+
+    def redo(self):
+        if not self._redo_stack:
+            return False
+        self._undo_stack.append(self._apply(self._redo_stack.pop()))
+        return True
+
+    def clear(self):
+        """Drop every event and the undo history (a new game, not an undoable edit)."""
+        self._rows = []  # Event rows, indexed by event id
+        self._removed = set()  # Ids of tombstoned events
+        self._timeline = []  # (video seconds, event_id) for every id, kept sorted with bisect
+        self._duplicate_index = defaultdict(set)  # (time bucket, player, code) -> live ids
+        self._postings = {field: defaultdict(set) for field in POSTING_FIELDS}  # value -> live ids
+        self._undo_stack = []  # Each entry is the list of changes that reverts one operation
+        self._redo_stack = []
+        self.totals = Counter()  # Live event count per (player_number, event_code)
+        self.version += 1
+        self._shared = False  # True while a snapshot shares _removed and _timeline
+
+    # ---------------------------------------------------------------- internals
+    def _do(self, changes):
+        if not changes:
+            return
+        self._undo_stack.append(self._apply(changes))
+        self._redo_stack = []
+
+    def _apply(self, changes):
+        """Apply primitive changes, notify listeners and return the changes that revert them."""
+        if self._shared:
+            # Copy on write: snapshots keep the tombstones and timeline they were given
+            self._removed = set(self._removed)
+            self._timeline = list(self._timeline)
+            self._shared = False
+        self.version += 1
+
+        inverse = []
+        notifications = []
+        for action, value in changes:
+            if action == "add":
+                event_id = len(self._rows)
+                self._rows.append(value)
+                insort(self._timeline, self.time_key(event_id))
+                self._index(event_id, 1)
+                inverse.append(("remove", event_id))
+            elif action == "remove":
+                event_id = value
+                self._removed.add(event_id)
+                self._index(event_id, -1)
+                inverse.append(("restore", event_id))
+            else:  # restore
+                event_id = value
+                self._removed.discard(event_id)
+                self._index(event_id, 1)
+                inverse.append(("remove", event_id))
+            notifications.append((action, event_id))
+
+        for listener in self._listeners:
+            listener(notifications)
+        inverse.reverse()
+        return inverse
+
+    def _index(self, event_id, delta):
+        # Add (delta=1) or drop (delta=-1) a live event in the totals and every index
+        row = self._rows[event_id]
+        key = (row[PLAYER_NUMBER], row[EVENT_CODE])
+        self.totals[key] += delta
+        if not self.totals[key]:
+            del self.totals[key]
+
+        seconds, duplicate_key = self._duplicate_key(event_id)
+        indexes = [(self._duplicate_index, duplicate_key)]
+        indexes += [(self._postings[field], row[column]) for field, column in POSTING_FIELDS.items()]
+        for index, value in indexes:
+            if delta > 0:
+                index[value].add(event_id)
+            else:
+                index[value].discard(event_id)
+                if not index[value]:
+                    del index[value]
+
+    def _duplicate_key(self, event_id):
+        row = self._rows[event_id]
+        seconds = video_time_seconds(row[VIDEO_TIME])
+        return seconds, (seconds // DUPLICATE_WINDOW_SECONDS, row[PLAYER_NUMBER], row[EVENT_CODE])
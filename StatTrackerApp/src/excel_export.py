@@ -0,0 +1,119 @@
+# Writing a game's events into the Excel workbook template
+
+import datetime
+import hashlib
+import io
+import os
+import pickle
+import webbrowser
+
+from openpyxl import load_workbook
+
+from event_store import PLAYER_NUMBER, VIDEO_TIME, video_time_seconds
+
+TEMPLATE_PATH = "../data/CSV to XL MASTER v3.xlsx"
+RAW_DATA_SHEET = "Raw Data"
+VIDEO_TIME_FORMAT = "[mm]:ss"  # Minutes keep counting past the first hour of video
+EXPORT_CHUNK_ROWS = 500  # Rows written between progress reports and cancellation checks
+
+_template_cache = {}  # path -> (mtime, size, content hash, pickled workbook)
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled before its workbook was saved."""
+
+
+def _serialize_template(workbook):
+    # openpyxl pickles a sheet's tables as {name: ref}, so the Table objects go alongside
+    tables = {sheet.title: list(sheet.tables.values()) for sheet in workbook.worksheets}
+    return pickle.dumps((workbook, tables), pickle.HIGHEST_PROTOCOL)
+
+
+def load_workbook_template(path):
+    """Return a fresh copy of the template workbook, parsing the file only when it changed.
+
+    The parsed template is kept pickled in memory; unpickling a copy is several times
+    faster than parsing the xlsx again. A changed mtime or size only triggers a re-parse
+    if the file's content hash changed too.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError("Excel template file not found.")
+
+    stat = os.stat(path)
+    cached = _template_cache.get(path)
+    if cached is None or cached[:2] != (stat.st_mtime, stat.st_size):
+        with open(path, "rb") as file:
+            content = file.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+        if cached is not None and cached[2] == content_hash:
+            serialized = cached[3]
+        else:
+            serialized = _serialize_template(load_workbook(io.BytesIO(content)))
+        cached = (stat.st_mtime, stat.st_size, content_hash, serialized)
+        _template_cache[path] = cached
+
+    workbook, tables = pickle.loads(cached[3])
+    for title, sheet_tables in tables.items():
+        for table in sheet_tables:
+            workbook[title].tables[table.displayName] = table
+    return workbook
+
+
+def excel_row(row):
+    """Return an event row as typed cell values: video time as a duration, player as a number.
+
+    The date, start time, venue and opponent stay text: the Stats sheet shows them
+    through General-formatted formulas, which would turn real dates into serial numbers.
+    """
+    values = list(row)
+    values[VIDEO_TIME] = datetime.timedelta(seconds=video_time_seconds(row[VIDEO_TIME]))
+    values[PLAYER_NUMBER] = int(row[PLAYER_NUMBER])
+    return values
+
+
+def fill_sheet_with_data(sheet, data):
+    """Append one row of typed cells per event, starting below the sheet's last row.
+
+    Only used when the template can't be streamed by workbook_xml.write_workbook, which
+    is the fast export path.
+    """
+    first_row = sheet.max_row + 1
+    sheet.cell(row=first_row - 1, column=1)  # append() skips an empty first row only once it has a cell
+    for row in data:
+        sheet.append(excel_row(row))
+    for (cell,) in sheet.iter_rows(min_row=first_row, min_col=VIDEO_TIME + 1, max_col=VIDEO_TIME + 1):
+        cell.number_format = VIDEO_TIME_FORMAT
+
+
+def export_workbook(rows, path, template_path=TEMPLATE_PATH, progress=None, cancel_event=None):
+    """Write event rows into a copy of the template and save it at path.
+
+    progress(done, total) is called after each chunk of rows and cancel_event (a
+    threading.Event) is checked between chunks. The workbook is saved to a temporary
+    file first, so a cancelled or failed export never leaves a partial file at path.
+    """
+    rows = list(rows)
+    workbook = load_workbook_template(template_path)
+    if RAW_DATA_SHEET not in workbook.sheetnames:
+        raise ValueError(f"Error: '{RAW_DATA_SHEET}' sheet not found in the template.")
+
+    sheet = workbook[RAW_DATA_SHEET]
+    for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+        if cancel_event is not None and cancel_event.is_set():
+            raise ExportCancelled("Export cancelled.")
+        fill_sheet_with_data(sheet, rows[start : start + EXPORT_CHUNK_ROWS])
+        if progress is not None:
+            progress(min(start + EXPORT_CHUNK_ROWS, len(rows)), len(rows))
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled("Export cancelled.")
+
+    temp_path = f"{path}.tmp"
+    workbook.save(temp_path)
+    os.replace(temp_path, path)
+
+
+def open_workbook(path):
+    try:
+        webbrowser.open(path)
+    except Exception as e:
+        raise Exception(f"Unable to open the Excel file: {e}")
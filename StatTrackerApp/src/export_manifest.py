@@ -0,0 +1,99 @@
+# Manifest of exported workbooks: which game each output file holds and its content hash
+
+import hashlib
+import json
+import os
+
+from event_schema import GAME_FIELDS
+
+MANIFEST_NAME = "manifest.json"
+
+
+def read_manifest(output_dir):
+    """Return {filename: {"game": {...game fields}, "hash": content hash}} for an output folder."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def game_key(game_info):
+    return {field: game_info[field] for field in GAME_FIELDS}
+
+
+def row_key(row):
+    """Return a short key identifying an event row's content."""
+    return hashlib.sha1("\x1f".join(row).encode("utf-8")).hexdigest()[:16]
+
+
+def plan_export(output_dir, game_info, content_hash, extension=".xlsx", taken=()):
+    """Pick the output file for a game and return (path, unchanged).
+
+    A game keeps the file it was first exported to. unchanged is True when that file
+    already holds exactly this content. A new game never takes a name used by another
+    game, by a file missing from the manifest or listed in taken (names already planned
+    for other games of a batch); it gets a numbered name instead.
+    """
+    manifest = read_manifest(output_dir)
+    key = game_key(game_info)
+    for filename, entry in manifest.items():
+        if entry["game"] == key and filename.endswith(extension):
+            path = os.path.join(output_dir, filename)
+            return path, entry["hash"] == content_hash and os.path.exists(path)
+
+    opponent_without_spaces = game_info["opponent"].replace(" ", "_")
+    stem = f"{game_info['date']}_{opponent_without_spaces}"
+    filename = stem + extension
+    copy_number = 1
+    while filename in manifest or filename in taken or os.path.exists(os.path.join(output_dir, filename)):
+        copy_number += 1
+        filename = f"{stem}_{copy_number}{extension}"
+    return os.path.join(output_dir, filename), False
+
+
+def record_export(path, game_info, content_hash, row_keys=None):
+    """Note in the output folder's manifest that path now holds this game content.
+
+    row_keys lists the row_key of the event in each sheet row, so the file can later be
+    updated in place; the file's size and mtime are kept to notice changes made elsewhere.
+    """
+    record_exports(os.path.dirname(path), [(path, game_info, content_hash, row_keys)])
+
+
+def record_exports(output_dir, exports):
+    """Record several exports to one output folder with a single manifest write.
+
+    exports is a list of (path, game_info, content_hash, row_keys) as for record_export.
+    """
+    manifest = read_manifest(output_dir)
+    for path, game_info, content_hash, row_keys in exports:
+        entry = {"game": game_key(game_info), "hash": content_hash}
+        if row_keys is not None:
+            stat = os.stat(path)
+            entry.update(rows=row_keys, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        manifest[os.path.basename(path)] = entry
+    write_manifest(output_dir, manifest)
+
+
+def written_rows(path):
+    """Return the row keys recorded for an exported file, or None if it can't be updated in place.
+
+    A file that was saved from Excel (or replaced) since it was exported is rebuilt instead.
+    """
+    output_dir, filename = os.path.split(path)
+    entry = read_manifest(output_dir).get(filename)
+    if entry is None or "rows" not in entry or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+        return None
+    return entry["rows"]
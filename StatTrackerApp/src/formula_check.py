@@ -0,0 +1,102 @@
+# Checking the Python formula calculation against hand-counted results for a small game
+#
+# Exports cache the Stats and Impact values computed by workbook_formulas instead of
+# leaving them to Excel, so a template change that the calculator gets wrong would
+# go unnoticed until someone opens a workbook. Run `python stattracker.py
+# check-formulas` after changing the template or workbook_formulas.
+
+import zipfile
+
+from excel_export import RAW_DATA_SHEET, TEMPLATE_PATH, excel_row
+from workbook_formulas import column_number
+from workbook_xml import workbook_calculator
+
+# A small game: player 1 (Stats and Impact row 2) records one of nearly every event,
+# player 23 (row 8) scores two threes, and player 7 is not on the template's roster
+CHECK_EVENTS = [
+    ("1", "2-point FG"),
+    ("1", "2-point FG"),
+    ("1", "Missed 2-point FG"),
+    ("1", "3-point FG"),
+    ("1", "Missed 3-point FG"),
+    ("1", "Free Throw"),
+    ("1", "Missed Free Throw"),
+    ("1", "Offensive Rebound"),
+    ("1", "Defensive Rebound"),
+    ("1", "Defensive Rebound"),
+    ("1", "Assist"),
+    ("1", "Steal"),
+    ("1", "Block"),
+    ("1", "Turnover"),
+    ("1", "Foul"),
+    ("23", "3-point FG"),
+    ("23", "3-point FG"),
+    ("23", "Shooting Foul"),
+    ("23", "Play of Interest"),
+    ("7", "2-point FG"),
+]
+
+# The results counted by hand from CHECK_EVENTS. Percentages are numbers when a shot
+# was missed and the text "0.0" or "100" otherwise, as the template's IF formulas give.
+CHECK_RESULTS = {
+    "Stats": {
+        # Player 1
+        "C2": 2, "D2": 3, "E2": 200 / 3, "F2": 1, "G2": 2, "H2": 50, "I2": 1, "J2": 2, "K2": 50,
+        "L2": 1, "M2": 2, "N2": 3, "O2": 1, "P2": 1, "Q2": 1, "R2": 1, "S2": 1,
+        "T2": 8, "V2": 14, "W2": 4, "X2": 10,
+        # Player 2, with no events
+        "C3": 0, "D3": 0, "E3": "0.0", "T3": 0, "V3": 0, "W3": 0, "X3": 0,
+        # Player 23
+        "C8": 0, "D8": 0, "E8": "0.0", "F8": 2, "G8": 2, "H8": "100", "I8": 0, "J8": 0, "K8": "0.0",
+        "N8": 0, "R8": 0, "S8": 1, "T8": 6, "V8": 6, "W8": 0, "X8": 6,
+        # Totals
+        "C12": 2, "D12": 3, "E12": 200 / 3, "F12": 3, "G12": 4, "H12": 75, "I12": 1, "J12": 2, "K12": 50,
+        "N12": 3, "O12": 1, "P12": 1, "Q12": 1, "R12": 1, "S12": 2, "T12": 14, "V12": 20, "W12": 4, "X12": 16,
+    },
+    "Impact": {
+        "C2": 14, "D2": 8, "E2": 1, "F2": 3, "G2": 2, "H2": 4, "I2": 3, "J2": 1, "K2": 10,
+        "C3": 0, "H3": 0, "K3": 0,
+        "C8": 6, "D8": 6, "E8": 0, "F8": 0, "G8": 0, "H8": 0, "I8": 0, "J8": 0, "K8": 6,
+        "C12": 20, "D12": 14, "H12": 4, "I12": 3, "J12": 1, "K12": 16,
+    },
+}
+
+
+def check_rows():
+    """Return CHECK_EVENTS as typed Raw Data rows."""
+    rows = []
+    for second, (player, description) in enumerate(CHECK_EVENTS):
+        row = ("01.18.24", "07:00PM", "Home", "Bulls", "1", f"00:{second:02}", player, "", "", description, "")
+        rows.append(excel_row(row))
+    return rows
+
+
+def _matches(value, expected):
+    if isinstance(expected, str) or isinstance(value, (str, bool)) or value is None:
+        return value == expected
+    try:
+        return abs(value - expected) < 1e-9
+    except TypeError:
+        return False
+
+
+def check_formulas(template_path=TEMPLATE_PATH):
+    """Calculate the template's formulas for the check game and return the mismatches.
+
+    Returns a list of (sheet, cell, calculated value, expected value); it is empty when
+    every result matches the hand counts. Raises ValueError if the template's formulas
+    can't be calculated in Python at all.
+    """
+    with zipfile.ZipFile(template_path) as template:
+        calculator, formula_sheets = workbook_calculator(template, RAW_DATA_SHEET)
+    if calculator is None:
+        raise ValueError(f"The formulas of {template_path} can't be calculated in Python.")
+    values = calculator.calculate(check_rows())
+    mismatches = []
+    for sheet, results in CHECK_RESULTS.items():
+        for cell, expected in results.items():
+            letters = cell.rstrip("0123456789")
+            value = values.get(sheet, {}).get((int(cell[len(letters):]), column_number(letters)))
+            if not _matches(value, expected):
+                mismatches.append((sheet, cell, value, expected))
+    return mismatches
@@ -0,0 +1,160 @@
+# Exporting a game's events to files in an output folder, for the app and the command line
+
+import os
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from event_export import typed_record, write_record_file
+from event_schema import GAME_FIELDS, game_content_hash, read_game_lines
+from excel_export import TEMPLATE_PATH, excel_row
+from export_manifest import plan_export, record_exports, row_key, written_rows
+from games_catalog import read_game_header
+from workbook_xml import patch_workbook_rows, template_parts, write_workbook
+
+
+def read_saved_game(path):
+    """Read a saved game file and return (game_info, rows)."""
+    with open(path, encoding="utf-8") as file:
+        header, rows = read_game_lines(file)
+        rows = list(rows)
+    return {field: header[field] for field in GAME_FIELDS}, rows
+
+
+def write_game_workbook(path, rows, template_path=TEMPLATE_PATH, progress=None, cancel_event=None, typed_rows=None):
+    """Write the game's workbook at path and return the row keys to record in the manifest.
+
+    A workbook this app exported earlier is updated in place with only the changed
+    events; otherwise, or if it can't be updated, it is written from the template.
+    """
+    written = written_rows(path)
+    if written:
+        try:
+            return patch_workbook_rows(path, rows, written, typed_rows=typed_rows)
+        except (ValueError, zipfile.BadZipFile):
+            pass  # Out of time order, or not laid out as this app writes it any more; rebuilt below
+    write_workbook(rows, path, template_path, progress, cancel_event, typed_rows)
+    return [row_key(row) for row in rows]
+
+
+def export_files(game_info, content_hash, rows, targets, template_path=TEMPLATE_PATH, progress=None, cancel_event=None):
+    """Write a game to several files at once and record them in their folders' manifests.
+
+    targets is {format: path}, with "xlsx" for the workbook or an event export format.
+    The events are read and converted to typed values once, then each file is written
+    from those values on its own thread; progress and cancel_event apply to the
+    workbook. If a file fails, the others are still written and recorded and the first
+    error is raised afterwards.
+    """
+    rows = list(rows)
+    typed_rows = [excel_row(row) for row in rows]
+    records = [typed_record(values) for values in typed_rows] if set(targets) - {"xlsx"} else None
+
+    def write(format, path):
+        if format == "xlsx":
+            return write_game_workbook(path, rows, template_path, progress, cancel_event, typed_rows)
+        write_record_file(records, path, format)
+        return None
+
+    exported = defaultdict(list)  # output folder -> [(path, game_info, content_hash, row_keys), ...]
+    errors = []
+    with ThreadPoolExecutor(len(targets)) as pool:
+        futures = {pool.submit(write, format, path): path for format, path in targets.items()}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                exported[os.path.dirname(path)].append((path, game_info, content_hash, future.result()))
+            except Exception as e:
+                errors.append(e)
+    for output_dir, exports in exported.items():
+        record_exports(output_dir, exports)
+    if errors:
+        raise errors[0]
+
+
+def export_game(output_dir, game_info, rows, template_path=TEMPLATE_PATH, force=False, formats=("xlsx",), compress=False):
+    """Export a game to its files in output_dir and return [(path, unchanged), ...] per format.
+
+    formats lists "xlsx" for the workbook and/or event export formats, whose files
+    compress gzips. A file that already holds this content is not written again, unless
+    force is set.
+    """
+    rows = list(rows)
+    content_hash = game_content_hash(game_info, rows)
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    targets = {}
+    for format in formats:
+        extension = f".{format}.gz" if compress and format != "xlsx" else f".{format}"
+        path, unchanged = plan_export(output_dir, game_info, content_hash, extension)
+        unchanged = unchanged and not force
+        results.append((path, unchanged))
+        if not unchanged:
+            targets[format] = path
+    if "xlsx" in targets and not os.path.exists(template_path):
+        raise FileNotFoundError(f"Excel template file not found: {template_path}")
+    if targets:
+        export_files(game_info, content_hash, rows, targets, template_path)
+    return results
+
+
+def _load_template(template_path):
+    # Runs once in each worker process, so every game it exports reuses the parsed template
+    template_parts(template_path)
+
+
+def _rebuild_workbook(game_path, path, template_path):
+    # Runs in a worker process; the manifest is only written by the parent
+    start = time.perf_counter()
+    game_info, rows = read_saved_game(game_path)
+    write_workbook(rows, path, template_path)
+    row_keys = [row_key(row) for row in rows]
+    return game_info, game_content_hash(game_info, rows), row_keys, time.perf_counter() - start
+
+
+def rebuild_workbooks(game_paths, output_dir, template_path=TEMPLATE_PATH, workers=None, on_result=None):
+    """Rebuild the workbook of every saved game from the template, several games at a time.
+
+    Each game keeps the file it was exported to before; games are written by a pool of
+    worker processes that each parse the template once, and the manifest is written once
+    at the end. on_result(game_path, path, seconds, error) is called as each game
+    finishes, with error None on success. Returns the number of games that failed.
+    """
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Excel template file not found: {template_path}")
+    os.makedirs(output_dir, exist_ok=True)
+    planned = {}  # game_path -> output path
+    taken = set()
+    for game_path in game_paths:
+        header = read_game_header(game_path)
+        path, unchanged = plan_export(output_dir, header, header.get("checksum"), taken=taken)
+        planned[game_path] = path
+        taken.add(os.path.basename(path))
+
+    failed = 0
+    exported = []  # (path, game_info, content_hash, row_keys) of each rebuilt workbook
+    try:
+        with ProcessPoolExecutor(workers, initializer=_load_template, initargs=(template_path,)) as pool:
+            futures = {
+                pool.submit(_rebuild_workbook, game_path, path, template_path): game_path
+                for game_path, path in planned.items()
+            }
+            for future in as_completed(futures):
+                game_path = futures[future]
+                path = planned[game_path]
+                try:
+                    game_info, content_hash, row_keys, seconds = future.result()
+                except Exception as e:
+                    failed += 1
+                    if on_result:
+                        on_result(game_path, path, None, e)
+                else:
+                    exported.append((path, game_info, content_hash, row_keys))
+                    if on_result:
+                        on_result(game_path, path, seconds, None)
+    finally:
+        # Games written before a failure or interruption are still recorded
+        if exported:
+            record_exports(output_dir, exported)
+    return failed
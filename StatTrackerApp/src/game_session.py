@@ -0,0 +1,78 @@
+# Game sessions: several games open at once, saved by one shared background writer
+
+import queue
+import threading
+
+from event_store import EventStore
+from games_catalog import GAMES_DIRECTORY, game_id_for, save_game
+
+
+class GameSession:
+    """One open game: its game info, its event store and the version last autosaved.
+
+    The roster and event codes come from config and are shared by every session, so an
+    idle session only holds its own events.
+    """
+
+    __slots__ = ("game_info", "event_store", "last_autosave_version")
+
+    def __init__(self):
+        self.game_info = {}
+        self.event_store = EventStore()
+        self.last_autosave_version = None
+
+    def title(self):
+        if not self.game_info:
+            return "New Game"
+        return f"{self.game_info['date']} {self.game_info['opponent']}"
+
+    def autosave_snapshot(self):
+        """Return a snapshot of the events if the game changed since the last call, else None."""
+        if not self.game_info or not len(self.event_store):
+            return None
+        if self.event_store.version == self.last_autosave_version:
+            return None
+        snapshot = self.event_store.snapshot()
+        self.last_autosave_version = snapshot.version
+        return snapshot
+
+
+class GameWriter:
+    """A single background thread that saves games in the order they were queued.
+
+    If a game is queued again before it was written, only its latest rows are saved.
+    """
+
+    def __init__(self, directory=GAMES_DIRECTORY, on_error=None):
+        self.directory = directory
+        self.on_error = on_error  # Called on the writer thread with the exception of a failed save
+        self._pending = {}  # game_id -> (game_info, rows) still to be written
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def save(self, game_info, rows):
+        """Queue a game to be saved; rows is read on the writer thread, so pass a snapshot."""
+        game_id = game_id_for(game_info)
+        with self._lock:
+            queued = game_id in self._pending
+            self._pending[game_id] = (dict(game_info), rows)
+        if not queued:
+            self._queue.put(game_id)
+
+    def wait(self):
+        """Block until every queued game has been written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            game_id = self._queue.get()
+            with self._lock:
+                game_info, rows = self._pending.pop(game_id)
+            try:
+                save_game(self.directory, game_info, rows)
+            except Exception as e:  # The thread must outlive a bad game, or wait() never returns
+                if self.on_error:
+                    self.on_error(e)
+            finally:
+                self._queue.task_done()
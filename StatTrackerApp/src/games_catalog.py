@@ -0,0 +1,137 @@
+# Saved games: a catalog of game headers with event bodies paged in on demand
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from itertools import chain, islice
+
+from event_schema import (
+    GAME_FIELDS,
+    SCHEMA_VERSION,
+    game_content_hash,
+    migrate_file,
+    read_game_lines,
+    schema_version,
+    write_game_lines,
+)
+
+GAMES_DIRECTORY = "../data/games"
+GAME_CACHE_SIZE = 8  # Number of recently opened games kept in memory
+
+
+def game_id_for(game_info):
+    """Build a file-safe game id such as "01.18.24_0700PM_Bulls"."""
+    parts = [game_info["date"], game_info["start_time"], game_info["opponent"]]
+    return "_".join("".join(ch for ch in part if ch.isalnum() or ch in ".-") for part in parts)
+
+
+def save_game(directory, game_info, rows):
+    """Write a game as JSON lines: one header line, then one record per event."""
+    rows = [list(row) for row in rows]
+    header = {field: game_info[field] for field in GAME_FIELDS}
+    header["event_count"] = len(rows)
+    header["checksum"] = game_content_hash(game_info, rows)
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{game_id_for(game_info)}.jsonl")
+    temp_path = f"{path}.{threading.get_ident()}.tmp"  # Saves may run on several threads
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.writelines(write_game_lines(header, rows))
+    os.replace(temp_path, path)  # Never leave a half-written game behind
+    return path
+
+
+def read_game_header(path):
+    """Read only the header line of a saved game."""
+    with open(path, encoding="utf-8") as file:
+        return json.loads(file.readline())
+
+
+def migrate_games_directory(directory=GAMES_DIRECTORY):
+    """Upgrade every saved game older than the current schema, one file at a time.
+
+    Returns the number of games upgraded; a missing directory has none.
+    """
+    upgraded = 0
+    if not os.path.isdir(directory):
+        return upgraded
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".jsonl") and schema_version(read_game_header(entry.path)) < SCHEMA_VERSION:
+            migrate_file(entry.path)
+            upgraded += 1
+    return upgraded
+
+
+def _date_key(date):
+    # Game dates are stored as MM.DD.YY
+    month, day, year = (date.split(".") + ["", "", ""])[:3]
+    return (year, month, day)
+
+
+class GamesCatalog:
+    """Headers of every saved game in a directory, with an LRU of opened game bodies."""
+
+    def __init__(self, directory=GAMES_DIRECTORY, cache_size=GAME_CACHE_SIZE):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._headers = {}  # game_id -> (mtime, size, header)
+        self._bodies = OrderedDict()  # game_id -> rows, least recently used first
+
+    def refresh(self):
+        """Rescan the directory, re-reading headers only for files that changed."""
+        headers = {}
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".jsonl"):
+                    continue
+                game_id = entry.name[: -len(".jsonl")]
+                stat = entry.stat()
+                cached = self._headers.get(game_id)
+                if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+                    headers[game_id] = cached
+                else:
+                    headers[game_id] = (stat.st_mtime, stat.st_size, read_game_header(entry.path))
+                    self._bodies.pop(game_id, None)
+        self._headers = headers
+
+    def headers(self):
+        """Return [(game_id, header), ...], most recent game first."""
+        items = [(game_id, cached[2]) for game_id, cached in self._headers.items()]
+        items.sort(key=lambda item: _date_key(item[1]["date"]), reverse=True)
+        return items
+
+    def header(self, game_id):
+        return self._headers[game_id][2]
+
+    def path(self, game_id):
+        return os.path.join(self.directory, f"{game_id}.jsonl")
+
+    def page(self, game_id, start, count):
+        """Read rows start..start+count of a game without loading the rest of it."""
+        if game_id in self._bodies:
+            return self._bodies[game_id][start : start + count]
+        with open(self.path(game_id), encoding="utf-8") as file:
+            header_line = file.readline()
+            header, rows = read_game_lines(chain([header_line], islice(file, start, start + count)))
+            return list(rows)
+
+    def iter_rows(self, game_id):
+        """Stream every row of a game from disk without caching it."""
+        with open(self.path(game_id), encoding="utf-8") as file:
+            header, rows = read_game_lines(file)
+            yield from rows
+
+    def load(self, game_id):
+        """Return every row of a game, keeping recently opened games in memory."""
+        if game_id in self._bodies:
+            self._bodies.move_to_end(game_id)
+            return self._bodies[game_id]
+
+        with open(self.path(game_id), encoding="utf-8") as file:
+            header, rows = read_game_lines(file)
+            rows = list(rows)
+        self._bodies[game_id] = rows
+        if len(self._bodies) > self.cache_size:
+            self._bodies.popitem(last=False)
+        return rows
@@ -0,0 +1,87 @@
+# Checking merge_event_logs against small cases worked out by hand
+#
+# Run `python stattracker.py check-merge` after changing event_merge.py.
+
+from event_merge import merge_event_logs
+from event_store import EVENT_CODE, PLAYER_NUMBER, VIDEO_TIME
+
+
+def check_row(video_time, player_number, event_code):
+    """Return an event row of the check game with only the fields the merge looks at set."""
+    return ("01.18.24", "07:00PM", "Home", "Bulls", "1", video_time, player_number, "", "", event_code, event_code)
+
+
+# (name, operators' logs, base log or None, expected rows as (video time, player, code),
+# expected number of conflicts); logs are written as (video time, player, code)
+CHECK_CASES = [
+    (
+        "basket logged by both operators",
+        [[("00:10", "1", "2")], [("00:11", "1", "2")]],
+        None,
+        [("00:10", "1", "2")],
+        0,
+    ),
+    (
+        "basket logged by both operators after an unrelated assist",
+        [[("00:08", "3", "a"), ("00:10", "1", "2")], [("00:11", "1", "2")]],
+        None,
+        [("00:08", "3", "a"), ("00:10", "1", "2")],
+        0,
+    ),
+    (
+        "two baskets by one player, logged by both operators",
+        [[("00:10", "1", "2"), ("00:11", "1", "2")], [("00:10", "1", "2"), ("00:12", "1", "2")]],
+        None,
+        [("00:10", "1", "2"), ("00:11", "1", "2")],
+        0,
+    ),
+    (
+        "same event further apart than the tolerance",
+        [[("00:10", "1", "2")], [("00:13", "1", "2")]],
+        None,
+        [("00:10", "1", "2"), ("00:13", "1", "2")],
+        0,
+    ),
+    (
+        "rebound credited to two players",
+        [[("00:20", "4", "or")], [("00:21", "5", "or")]],
+        None,
+        [("00:20", "4", "or"), ("00:21", "5", "or")],
+        1,
+    ),
+    (
+        "one player, different events from each operator",
+        [[("00:30", "4", "s")], [("00:30", "4", "b")]],
+        None,
+        [("00:30", "4", "s"), ("00:30", "4", "b")],
+        1,
+    ),
+    (
+        "event removed by one operator, added by both",
+        [[("00:30", "2", "a"), ("00:40", "3", "s")], [("00:05", "1", "2"), ("00:30", "2", "a"), ("00:41", "3", "s")]],
+        [("00:05", "1", "2"), ("00:30", "2", "a")],
+        [("00:30", "2", "a"), ("00:40", "3", "s")],
+        0,
+    ),
+]
+
+
+def _summary(row):
+    return (row[VIDEO_TIME], row[PLAYER_NUMBER], row[EVENT_CODE])
+
+
+def check_merge():
+    """Merge every check case and return the cases whose result differs from the expected one.
+
+    Returns a list of (case name, merged rows, conflict count) as summarized rows; it is
+    empty when every case matches.
+    """
+    failures = []
+    for name, logs, base, expected_rows, expected_conflicts in CHECK_CASES:
+        streams = [[check_row(*event) for event in log] for log in logs]
+        base_rows = None if base is None else [check_row(*event) for event in base]
+        merged, conflicts = merge_event_logs(streams, base_rows)
+        merged = [_summary(row) for row in merged]
+        if sorted(merged) != sorted(expected_rows) or len(conflicts) != expected_conflicts:
+            failures.append((name, merged, len(conflicts)))
+    return failures
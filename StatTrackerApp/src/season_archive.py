@@ -0,0 +1,104 @@
+# Season archive: one zip file holding every game, each compressed on its own
+
+import io
+import json
+import shutil
+import zipfile
+
+from config import team_roster, event_codes
+from event_schema import SCHEMA_VERSION, migrate_lines, read_game_lines, upgrade, write_game_lines
+
+# Results of append_game
+ADDED = "added"
+ALREADY_ARCHIVED = "already archived"
+CHANGED = "changed"  # The game was saved again after it was archived
+
+INDEX_PREFIX = "index/"  # Uncompressed game headers, one small member per game
+GAMES_PREFIX = "games/"  # Compressed game bodies: header line with roster and codes, then records
+
+
+def _index_name(game_id):
+    return f"{INDEX_PREFIX}{game_id}.json"
+
+
+def _game_name(game_id):
+    return f"{GAMES_PREFIX}{game_id}.jsonl"
+
+
+def read_index(archive_path):
+    """Return [(game_id, header), ...] for every game in the archive without touching game bodies."""
+    games = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for name in archive.namelist():
+            if name.startswith(INDEX_PREFIX) and name.endswith(".json"):
+                games.append((name[len(INDEX_PREFIX) : -len(".json")], json.loads(archive.read(name))))
+    return games
+
+
+def append_game(archive_path, game_id, header, rows, roster=None, codes=None):
+    """Append one game to an archive (created if missing) without rewriting existing members.
+
+    Returns ADDED, ALREADY_ARCHIVED if the game is archived with the same checksum, or
+    CHANGED if a different version of it is archived. A changed game is left out, since
+    a zip member can't be replaced in place; it has to go into a new archive.
+    """
+    roster = team_roster if roster is None else roster
+    codes = event_codes if codes is None else codes
+
+    with zipfile.ZipFile(archive_path, "a") as archive:
+        if _index_name(game_id) in archive.namelist():
+            archived = json.loads(archive.read(_index_name(game_id)))
+            if archived.get("checksum") == header.get("checksum"):
+                return ALREADY_ARCHIVED
+            return CHANGED
+
+        game_header = dict(header)
+        game_header["team_roster"] = {str(number): list(names) for number, names in roster.items()}
+        game_header["event_codes"] = dict(codes)
+
+        # Stream the rows into their own deflated member, then add the stored index entry
+        game_info = zipfile.ZipInfo(_game_name(game_id))
+        game_info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(game_info, "w") as member:
+            with io.TextIOWrapper(member, encoding="utf-8") as text:
+                text.writelines(write_game_lines(game_header, rows))
+        index_header = dict(header, schema=SCHEMA_VERSION)
+        archive.writestr(_index_name(game_id), json.dumps(index_header), compress_type=zipfile.ZIP_STORED)
+    return ADDED
+
+
+def iter_game(archive_path, game_id):
+    """Yield a game's full header, then each of its rows, decompressing only that game."""
+    with zipfile.ZipFile(archive_path) as archive:
+        with archive.open(_game_name(game_id)) as member:
+            header, rows = read_game_lines(io.TextIOWrapper(member, encoding="utf-8"))
+            yield header
+            yield from rows
+
+
+def read_game(archive_path, game_id):
+    """Return (header, rows) for one archived game; the header includes its roster and codes."""
+    game = iter_game(archive_path, game_id)
+    header = next(game)
+    return header, list(game)
+
+
+def migrate_archive(source_path, target_path):
+    """Write a copy of an archive with every game upgraded to the current schema.
+
+    Members are streamed one line at a time, so memory use doesn't grow with the archive.
+    """
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(target_path, "w") as target:
+        for info in source.infolist():
+            target_info = zipfile.ZipInfo(info.filename, info.date_time)
+            target_info.compress_type = info.compress_type
+            if info.filename.startswith(INDEX_PREFIX):
+                header, records = upgrade(json.loads(source.read(info)), [])
+                target.writestr(target_info, json.dumps(header))
+                continue
+            with source.open(info) as member, target.open(target_info, "w") as target_member:
+                if info.filename.startswith(GAMES_PREFIX):
+                    with io.TextIOWrapper(target_member, encoding="utf-8") as text:
+                        text.writelines(migrate_lines(io.TextIOWrapper(member, encoding="utf-8")))
+                else:
+                    shutil.copyfileobj(member, target_member)
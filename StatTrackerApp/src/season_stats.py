@@ -0,0 +1,106 @@
+# Season totals per player, combined from every exported workbook in an output folder
+
+import csv
+import json
+import os
+from collections import Counter
+
+from config import event_codes
+from event_schema import GAME_FIELDS
+from event_store import DESCRIPTION, FIRST_NAME, LAST_NAME, PLAYER_NUMBER
+from workbook_import import raw_data_rows
+
+SEASON_CACHE_NAME = ".season_cache.json"  # Per-workbook summaries, kept next to the workbooks
+SEASON_CACHE_VERSION = 1
+
+
+def game_summary(path):
+    """Count each player's events in one exported workbook.
+
+    Returns {"game": {...game fields of the first event}, "players": {number:
+    {"first_name", "last_name", "events": {description: count}}}}.
+    """
+    game = None
+    players = {}
+    for number, row in raw_data_rows(path):
+        if game is None:
+            game = {field: row[column] for field, column in GAME_FIELDS.items()}
+        player = players.get(row[PLAYER_NUMBER])
+        if player is None:
+            player = {"first_name": row[FIRST_NAME], "last_name": row[LAST_NAME], "events": Counter()}
+            players[row[PLAYER_NUMBER]] = player
+        player["events"][row[DESCRIPTION]] += 1
+    return {"game": game, "players": players}
+
+
+def _read_cache(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != SEASON_CACHE_VERSION:
+        return {}
+    return cache["files"]
+
+
+def _write_cache(path, files):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"version": SEASON_CACHE_VERSION, "files": files}, file)
+    os.replace(temp_path, path)
+
+
+def season_summaries(output_dir):
+    """Return {filename: game summary} for every workbook in output_dir.
+
+    Summaries are cached in a sidecar file keyed by each workbook's size and mtime, so
+    only workbooks added or changed since the last run are read again.
+    """
+    cache_path = os.path.join(output_dir, SEASON_CACHE_NAME)
+    cached = _read_cache(cache_path)
+    files = {}
+    for entry in os.scandir(output_dir):
+        # Skip Excel's lock files for open workbooks
+        if not entry.name.endswith(".xlsx") or entry.name.startswith("~$"):
+            continue
+        stat = entry.stat()
+        entry_cache = cached.get(entry.name)
+        if entry_cache is None or (entry_cache["size"], entry_cache["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            entry_cache = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            entry_cache["summary"] = game_summary(entry.path)
+        files[entry.name] = entry_cache
+    if files != cached:
+        _write_cache(cache_path, files)
+    return {filename: entry_cache["summary"] for filename, entry_cache in files.items()}
+
+
+def season_totals(summaries):
+    """Combine game summaries into {player number: {"first_name", "last_name", "games", "events"}}."""
+    totals = {}
+    for summary in summaries.values():
+        for number, player in summary["players"].items():
+            total = totals.get(number)
+            if total is None:
+                total = {"first_name": player["first_name"], "last_name": player["last_name"]}
+                total.update(games=0, events=Counter())
+                totals[number] = total
+            total["games"] += 1
+            total["events"].update(player["events"])
+    return totals
+
+
+def write_season_report(totals, file):
+    """Write season totals as CSV: one row per player, one column per event description."""
+    descriptions = list(event_codes.values())
+    for total in totals.values():
+        descriptions += [description for description in total["events"] if description not in descriptions]
+    writer = csv.writer(file, lineterminator="\n")
+    writer.writerow(["player_number", "first_name", "last_name", "games"] + descriptions)
+    numbers = sorted(totals, key=lambda number: (not number.isdigit(), int(number) if number.isdigit() else 0, number))
+    for number in numbers:
+        total = totals[number]
+        writer.writerow(
+            [number, total["first_name"], total["last_name"], total["games"]]
+            + [total["events"].get(description, 0) for description in descriptions]
+        )
@@ -0,0 +1,164 @@
+# Command-line tools for saved games, without the GUI
+#
+#   python stattracker.py export --game 01.18.24_0700PM_Bulls --format xlsx --out ../output
+#   python stattracker.py export --game 01.18.24_0700PM_Bulls --format ndjson --gzip
+#   python stattracker.py export --game 01.18.24_0700PM_Bulls --format xlsx,csv,ndjson,html
+#   python stattracker.py export-all --out ../output --jobs 8
+#   python stattracker.py season --out ../output --report season.csv
+#   python stattracker.py check-formulas
+#   python stattracker.py check-merge
+#
+# Exit status: 0 when the export succeeded (or the workbook was already up to date),
+# 1 when it failed (for export-all: when any game failed), 2 for invalid arguments.
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+
+from event_export import EVENT_EXPORT_FORMATS
+from formula_check import check_formulas
+from game_export import export_game, read_saved_game, rebuild_workbooks
+from merge_check import check_merge
+from season_stats import season_summaries, season_totals, write_season_report
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_GAMES_DIRECTORY = os.path.join(APP_DIRECTORY, "data", "games")
+DEFAULT_TEMPLATE_PATH = os.path.join(APP_DIRECTORY, "data", "CSV to XL MASTER v3.xlsx")
+DEFAULT_OUTPUT_DIRECTORY = os.path.join(APP_DIRECTORY, "output")
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+EXPORT_FORMATS = ("xlsx", *EVENT_EXPORT_FORMATS)
+
+
+def game_path(game, games_directory):
+    """Resolve --game: a saved game file, or the id of a game in the games folder."""
+    if os.path.isfile(game):
+        return game
+    path = os.path.join(games_directory, f"{game}.jsonl")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Game not found: {game}")
+    return path
+
+
+def export_formats(value):
+    """Parse --format: one format or several separated by commas, e.g. xlsx,csv."""
+    formats = [format.strip() for format in value.split(",") if format.strip()]
+    unknown = [format for format in formats if format not in EXPORT_FORMATS]
+    if not formats or unknown:
+        raise argparse.ArgumentTypeError(f"choose formats from {', '.join(EXPORT_FORMATS)}")
+    return list(dict.fromkeys(formats))
+
+
+def run_export(args):
+    game_info, rows = read_saved_game(game_path(args.game, args.games_dir))
+    for path, unchanged in export_game(args.out, game_info, rows, args.template, args.force, args.format, args.gzip):
+        if unchanged:
+            print(f"Up to date: {path}")
+        else:
+            print(f"Exported {len(rows)} events to {path}")
+    return EXIT_OK
+
+
+def run_export_all(args):
+    game_paths = sorted(
+        entry.path for entry in os.scandir(args.games_dir) if entry.name.endswith(".jsonl")
+    )
+
+    def report(game_path, path, seconds, error):
+        game_id = os.path.basename(game_path)[: -len(".jsonl")]
+        if error is None:
+            print(f"{seconds:7.2f}s  {game_id} -> {os.path.basename(path)}", flush=True)
+        else:
+            print(f"FAILED    {game_id}: {error}", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    failed = rebuild_workbooks(game_paths, args.out, args.template, args.jobs, report)
+    elapsed = time.perf_counter() - start
+    print(f"Rebuilt {len(game_paths) - failed} of {len(game_paths)} games in {elapsed:.2f}s")
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def run_season(args):
+    totals = season_totals(season_summaries(args.out))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8", newline="") as file:
+            write_season_report(totals, file)
+    else:
+        write_season_report(totals, sys.stdout)
+    return EXIT_OK
+
+
+def run_check_formulas(args):
+    mismatches = check_formulas(args.template)
+    for sheet, cell, value, expected in mismatches:
+        print(f"{sheet}!{cell}: calculated {value!r}, expected {expected!r}", file=sys.stderr)
+    if mismatches:
+        return EXIT_FAILED
+    print(f"The formulas of {os.path.basename(args.template)} give the expected results.")
+    return EXIT_OK
+
+
+def run_check_merge(args):
+    failures = check_merge()
+    for name, rows, conflicts in failures:
+        print(f"{name}: merged to {rows} with {conflicts} conflict(s)", file=sys.stderr)
+    if failures:
+        return EXIT_FAILED
+    print("Every merge case gives the expected events and conflicts.")
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="stattracker", description="Stat Tracker command-line tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Export a saved game to a workbook.")
+    export.add_argument("--game", required=True, help="game id in the games folder, or a saved game file")
+    export.add_argument(
+        "--format", type=export_formats, default=["xlsx"], help="output formats, separated by commas (default: xlsx)"
+    )
+    export.add_argument("--gzip", action="store_true", help="gzip the ndjson, csv and html exports")
+    export.add_argument("--out", default=DEFAULT_OUTPUT_DIRECTORY, help="output folder (default: StatTrackerApp/output)")
+    export.add_argument("--games-dir", default=DEFAULT_GAMES_DIRECTORY, help="saved games folder (default: StatTrackerApp/data/games)")
+    export.add_argument("--template", default=DEFAULT_TEMPLATE_PATH, help="Excel template workbook")
+    export.add_argument("--force", action="store_true", help="write the workbook even if it is up to date")
+    export.set_defaults(run=run_export)
+
+    export_all = commands.add_parser("export-all", help="Rebuild every saved game's workbook from the template.")
+    export_all.add_argument("--out", default=DEFAULT_OUTPUT_DIRECTORY, help="output folder (default: StatTrackerApp/output)")
+    export_all.add_argument("--games-dir", default=DEFAULT_GAMES_DIRECTORY, help="saved games folder (default: StatTrackerApp/data/games)")
+    export_all.add_argument("--template", default=DEFAULT_TEMPLATE_PATH, help="Excel template workbook")
+    export_all.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    export_all.set_defaults(run=run_export_all)
+
+    season = commands.add_parser("season", help="Total every player's events over the exported workbooks.")
+    season.add_argument("--out", default=DEFAULT_OUTPUT_DIRECTORY, help="folder of exported workbooks (default: StatTrackerApp/output)")
+    season.add_argument("--report", help="CSV file to write the totals to (default: standard output)")
+    season.set_defaults(run=run_season)
+
+    check = commands.add_parser(
+        "check-formulas", help="Check the formulas computed for exports against hand counts for a small game."
+    )
+    check.add_argument("--template", default=DEFAULT_TEMPLATE_PATH, help="Excel template workbook")
+    check.set_defaults(run=run_check_formulas)
+
+    check_merge_command = commands.add_parser("check-merge", help="Check the merge of event logs against worked cases.")
+    check_merge_command.set_defaults(run=run_check_merge)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"stattracker {args.command}: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,577 @@
+# Computing a workbook's formulas in Python, so exports carry cached values
+#
+# Only what the Excel template uses is supported: cell and range references (also on
+# other sheets and whole columns), Table1[column] and Table1[[#This Row],[column]],
+# + - * / and comparisons, and the functions SUM, IF and COUNTIFS with plain equality
+# criteria. Anything else raises UnsupportedFormula, and the caller leaves the
+# calculation to Excel instead.
+
+import re
+from collections import Counter
+from xml.sax.saxutils import escape, unescape
+
+XML_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<string>"(?:[^"]|"")*")
+    |(?P<table>[A-Za-z_][\w.]*\[(?:\[[^\]]*\]|[^\[\]])*\])
+    |(?P<reference>(?:(?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?
+        (?:\$?[A-Z]{1,3}\$?\d+(?::\$?[A-Z]{1,3}\$?\d+)?|\$?[A-Z]{1,3}:\$?[A-Z]{1,3}))
+    |(?P<function>[A-Z][A-Z0-9.]*)\(
+    |(?P<number>\d+(?:\.\d*)?(?:[Ee][+-]?\d+)?)
+    |(?P<operator><>|<=|>=|[-+*/<>=(),])
+    """,
+    re.X,
+)
+CELL_PATTERN = re.compile(r'<c r="([A-Z]+)(\d+)"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+FORMULA_PATTERN = re.compile(r"<f([^>]*)/>|<f([^>]*)>(.*?)</f>", re.S)
+VALUE_PATTERN = re.compile(r"<v>(.*?)</v>", re.S)
+TEXT_PATTERN = re.compile(r"<t(?:\s[^>]*)?>(.*?)</t>", re.S)
+SHARED_STRING_PATTERN = re.compile(r"<si>(.*?)</si>", re.S)
+COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class UnsupportedFormula(ValueError):
+    """Raised for a formula the calculator can't evaluate."""
+
+
+class ExcelError:
+    """An Excel error value such as #DIV/0!."""
+
+    def __init__(self, code):
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __repr__(self):
+        return self.code
+
+
+DIV_ZERO = ExcelError("#DIV/0!")
+VALUE_ERROR = ExcelError("#VALUE!")
+
+
+def column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number
+
+
+def column_letters(number):
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _xml_text(text):
+    return unescape(text, XML_ENTITIES)
+
+
+def read_shared_strings(xml):
+    return ["".join(_xml_text(text) for text in TEXT_PATTERN.findall(item)) for item in SHARED_STRING_PATTERN.findall(xml)]
+
+
+def _cell_value(attributes, body, shared_strings):
+    kind = re.search(r'\bt="(\w+)"', attributes)
+    kind = kind.group(1) if kind else "n"
+    if kind == "inlineStr":
+        return "".join(_xml_text(text) for text in TEXT_PATTERN.findall(body))
+    value = VALUE_PATTERN.search(body)
+    if value is None:
+        return None
+    value = _xml_text(value.group(1))
+    if kind == "s":
+        return shared_strings[int(value)]
+    if kind == "str":
+        return value
+    if kind == "b":
+        return value == "1"
+    if kind == "e":
+        return ExcelError(value)
+    return float(value)
+
+
+def _tokens(formula):
+    position = 0
+    while position < len(formula):
+        match = TOKEN_PATTERN.match(formula, position)
+        if match is None:
+            raise UnsupportedFormula(f"Can't read formula {formula!r} at {formula[position:]!r}")
+        position = match.end()
+        if match.lastgroup != "space":
+            yield match.lastgroup, match.group(match.lastgroup), match.group(0)
+
+
+def _shift_reference(reference, row_offset, column_offset):
+    sheet, _, cells = reference.rpartition("!")
+
+    def shift(match):
+        column_absolute, column, row_absolute, row = match.groups()
+        if not column_absolute:
+            column = column_letters(column_number(column) + column_offset)
+        if row and not row_absolute:
+            row = str(int(row) + row_offset)
+        return f"{column_absolute}{column}{row_absolute}{row}"
+
+    cells = re.sub(r"(\$?)([A-Z]{1,3})(\$?)(\d*)", shift, cells)
+    return f"{sheet}!{cells}" if sheet else cells
+
+
+def shift_formula(formula, row_offset, column_offset):
+    """Return a shared formula as written for a cell row_offset/column_offset away from its master."""
+    parts = []
+    for kind, value, text in _tokens(formula):
+        if kind == "reference":
+            value = _shift_reference(value, row_offset, column_offset)
+            parts.append(value)
+        else:
+            parts.append(text)
+    return "".join(parts)
+
+
+class _Parser:
+    # Recursive descent over the tokens of one formula, producing nested tuples
+
+    def __init__(self, formula):
+        self.formula = formula
+        self.tokens = list(_tokens(formula))
+        self.position = 0
+
+    def parse(self):
+        node = self.comparison()
+        if self.position != len(self.tokens):
+            raise UnsupportedFormula(f"Unexpected text in formula {self.formula!r}")
+        return node
+
+    def peek(self):
+        return self.tokens[self.position][:2] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        kind, token = self.peek()
+        if kind is None or (value is not None and token != value):
+            raise UnsupportedFormula(f"Expected {value or 'more'} in formula {self.formula!r}")
+        self.position += 1
+        return kind, token
+
+    def comparison(self):
+        node = self.additive()
+        kind, token = self.peek()
+        if kind == "operator" and token in COMPARISONS:
+            self.take()
+            node = ("compare", token, node, self.additive())
+        return node
+
+    def additive(self):
+        node = self.term()
+        while self.peek() in (("operator", "+"), ("operator", "-")):
+            node = ("arithmetic", self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (("operator", "*"), ("operator", "/")):
+            node = ("arithmetic", self.take()[1], node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ("operator", "-"):
+            self.take()
+            return ("arithmetic", "-", ("number", 0.0), self.unary())
+        if self.peek() == ("operator", "+"):
+            self.take()
+        return self.primary()
+
+    def primary(self):
+        kind, token = self.take()
+        if kind == "number":
+            return ("number", float(token))
+        if kind == "string":
+            return ("string", token[1:-1].replace('""', '"'))
+        if kind == "reference":
+            return _reference_node(token)
+        if kind == "table":
+            return _table_node(token)
+        if kind == "function":
+            arguments = []
+            if self.peek() != ("operator", ")"):
+                arguments.append(self.comparison())
+                while self.peek() == ("operator", ","):
+                    self.take()
+                    arguments.append(self.comparison())
+            self.take(")")
+            return ("call", token.upper(), arguments)
+        if token == "(":
+            node = self.comparison()
+            self.take(")")
+            return node
+        raise UnsupportedFormula(f"Unexpected {token!r} in formula {self.formula!r}")
+
+
+def _reference_node(reference):
+    sheet, _, cells = reference.rpartition("!")
+    if sheet.startswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    corners = []
+    for corner in cells.replace("$", "").split(":"):
+        match = re.fullmatch(r"([A-Z]{1,3})(\d*)", corner)
+        corners.append((column_number(match.group(1)), int(match.group(2)) if match.group(2) else None))
+    if len(corners) == 1:
+        corners.append(corners[0])
+    (first_column, first_row), (last_column, last_row) = corners
+    return ("range", sheet or None, first_column, first_row, last_column, last_row)
+
+
+def _table_node(reference):
+    table, _, specifier = reference.partition("[")
+    specifier = specifier[:-1]  # Drop the closing bracket
+    parts = re.findall(r"\[([^\]]*)\]", specifier) if specifier.startswith("[") else [specifier]
+    parts = [re.sub(r"'(.)", r"\1", part) for part in parts]
+    this_row = False
+    columns = []
+    for part in parts:
+        if part.lower() == "#this row":
+            this_row = True
+        elif part.startswith("#"):
+            raise UnsupportedFormula(f"Unsupported table specifier {part!r}")
+        else:
+            columns.append(part)
+    if len(columns) != 1:
+        raise UnsupportedFormula(f"Unsupported table reference {reference!r}")
+    return ("table", table, columns[0], this_row)
+
+
+class Table:
+    """An Excel table: its sheet, the cell range of its data rows and its column names."""
+
+    def __init__(self, name, sheet, ref, columns):
+        self.name = name
+        self.sheet = sheet
+        first, last = ref.split(":")
+        first = re.fullmatch(r"([A-Z]+)(\d+)", first)
+        last = re.fullmatch(r"([A-Z]+)(\d+)", last)
+        self.first_column = column_number(first.group(1))
+        self.first_row = int(first.group(2)) + 1  # The first row holds the column names
+        self.last_row = int(last.group(2))
+        self.columns = {column.lower(): index for index, column in enumerate(columns)}
+
+
+class WorkbookCalculator:
+    """The formulas of a workbook's sheets, evaluated against new rows for one data sheet.
+
+    sheets maps each sheet name to its worksheet XML; the cells of data_sheet are replaced
+    by the rows given to calculate().
+    """
+
+    def __init__(self, sheets, shared_strings, tables, data_sheet):
+        self.data_sheet = data_sheet
+        self.tables = {table.name.lower(): table for table in tables}
+        self.values = {}  # sheet -> {(row, column): value} of constant cells
+        self.formulas = {}  # sheet -> {(row, column): parsed formula}
+        for sheet, xml in sheets.items():
+            if sheet == data_sheet:
+                continue
+            self.values[sheet] = {}
+            self.formulas[sheet] = {}
+            masters = {}  # shared formula index -> (row, column, formula)
+            for letters, row, attributes, body in CELL_PATTERN.findall(xml):
+                cell = (int(row), column_number(letters))
+                formula = FORMULA_PATTERN.search(body or "")
+                if formula is None:
+                    self.values[sheet][cell] = _cell_value(attributes, body or "", shared_strings)
+                    continue
+                formula_attributes = formula.group(1) or formula.group(2)
+                text = _xml_text(formula.group(3) or "")
+                shared = re.search(r'\bsi="(\d+)"', formula_attributes)
+                if "t=\"shared\"" in formula_attributes and shared:
+                    if text:
+                        masters[shared.group(1)] = (cell, text)
+                    else:
+                        (master_row, master_column), text = masters[shared.group(1)]
+                        text = shift_formula(text, cell[0] - master_row, cell[1] - master_column)
+                elif "t=" in formula_attributes:
+                    raise UnsupportedFormula(f"Unsupported formula type in {sheet}!{letters}{row}")
+                self.formulas[sheet][cell] = _Parser(text).parse()
+
+    def calculate(self, rows):
+        """Return {sheet: {(row, column): value}} for every formula, with rows as the data sheet.
+
+        rows[i] holds the cell values of data sheet row 2 + i, or None for an empty row.
+        """
+        evaluation = _Evaluation(self, rows)
+        return {
+            sheet: {cell: evaluation.cell(sheet, *cell) for cell in formulas}
+            for sheet, formulas in self.formulas.items()
+        }
+
+
+class _Evaluation:
+    # One calculation: the data rows, memoized cell values and COUNTIFS indexes
+
+    def __init__(self, calculator, rows):
+        self.calculator = calculator
+        self.rows = rows
+        self.memo = {}
+        self.counts = {}  # tuple of ranges -> Counter of normalized value tuples
+
+    def cell(self, sheet, row, column):
+        calculator = self.calculator
+        if sheet == calculator.data_sheet:
+            index = row - 2
+            if 0 <= index < len(self.rows) and self.rows[index] is not None:
+                values = self.rows[index]
+                return _number(values[column - 1]) if column <= len(values) else None
+            return None
+        if sheet not in calculator.formulas:
+            raise UnsupportedFormula(f"Unknown sheet {sheet!r}")
+        key = (sheet, row, column)
+        if key not in self.memo:
+            formula = calculator.formulas[sheet].get((row, column))
+            if formula is None:
+                self.memo[key] = calculator.values[sheet].get((row, column))
+            else:
+                self.memo[key] = VALUE_ERROR  # Guards against circular references
+                self.memo[key] = self.evaluate(formula, sheet, row)
+        return self.memo[key]
+
+    def last_row(self, sheet):
+        if sheet == self.calculator.data_sheet:
+            return len(self.rows) + 1
+        cells = list(self.calculator.values[sheet]) + list(self.calculator.formulas[sheet])
+        return max((row for row, column in cells), default=0)
+
+    def range_cells(self, node, sheet):
+        # Return the (sheet, [(row, column), ...]) a range node covers, one column at a time
+        kind, range_sheet, first_column, first_row, last_column, last_row = node
+        range_sheet = range_sheet or sheet
+        if range_sheet not in self.calculator.formulas and range_sheet != self.calculator.data_sheet:
+            raise UnsupportedFormula(f"Unknown sheet {range_sheet!r}")
+        if first_row is None:
+            first_row, last_row = 1, self.last_row(range_sheet)
+        cells = [
+            (row, column)
+            for column in range(first_column, last_column + 1)
+            for row in range(first_row, last_row + 1)
+        ]
+        return range_sheet, cells
+
+    def table_range(self, node):
+        kind, name, column, this_row = node
+        table = self.calculator.tables.get(name.lower())
+        if table is None or column.lower() not in table.columns:
+            raise UnsupportedFormula(f"Unknown table column {name}[{column}]")
+        table_column = table.first_column + table.columns[column.lower()]
+        return ("range", table.sheet, table_column, table.first_row, table_column, table.last_row)
+
+    def values(self, node, sheet, row):
+        # Evaluate a node that may be a range to a flat list of values
+        if node[0] == "table" and not node[3]:
+            node = self.table_range(node)
+        if node[0] == "range":
+            range_sheet, cells = self.range_cells(node, sheet)
+            return [self.cell(range_sheet, *cell) for cell in cells]
+        return [self.evaluate(node, sheet, row)]
+
+    def evaluate(self, node, sheet, row):
+        kind = node[0]
+        if kind in ("number", "string"):
+            return node[1]
+        if kind == "range":
+            if node[2:4] != node[4:6] or node[3] is None:
+                return VALUE_ERROR  # A range used as a single value
+            return self.cell(node[1] or sheet, node[3], node[2])
+        if kind == "table":
+            table_range = self.table_range(node)
+            if not node[3]:
+                return VALUE_ERROR
+            table = self.calculator.tables[node[1].lower()]
+            if not table.first_row <= row <= table.last_row:
+                return VALUE_ERROR
+            return self.cell(table.sheet, row, table_range[2])
+        if kind == "arithmetic":
+            return _arithmetic(node[1], self.evaluate(node[2], sheet, row), self.evaluate(node[3], sheet, row))
+        if kind == "compare":
+            return _compare(node[1], self.evaluate(node[2], sheet, row), self.evaluate(node[3], sheet, row))
+        if kind == "call":
+            return self.call(node[1], node[2], sheet, row)
+        raise UnsupportedFormula(f"Unsupported formula element {kind!r}")
+
+    def call(self, name, arguments, sheet, row):
+        if name == "SUM":
+            total = 0.0
+            for argument in arguments:
+                direct = argument[0] not in ("range", "table") or (argument[0] == "table" and argument[3])
+                for value in self.values(argument, sheet, row):
+                    if isinstance(value, ExcelError):
+                        return value
+                    if isinstance(value, float) or (direct and isinstance(value, bool)):
+                        total += value
+                    elif direct and isinstance(value, str):
+                        value = _arithmetic_operand(value)
+                        if isinstance(value, ExcelError):
+                            return value
+                        total += value
+            return total
+        if name == "IF":
+            if not 2 <= len(arguments) <= 3:
+                raise UnsupportedFormula("IF takes two or three arguments")
+            condition = self.evaluate(arguments[0], sheet, row)
+            if isinstance(condition, ExcelError):
+                return condition
+            if isinstance(condition, str):
+                return VALUE_ERROR
+            if condition:
+                return self.evaluate(arguments[1], sheet, row)
+            return self.evaluate(arguments[2], sheet, row) if len(arguments) == 3 else False
+        if name == "COUNTIFS":
+            return self.countifs(arguments, sheet, row)
+        raise UnsupportedFormula(f"Unsupported function {name}")
+
+    def countifs(self, arguments, sheet, row):
+        if not arguments or len(arguments) % 2:
+            raise UnsupportedFormula("COUNTIFS takes pairs of ranges and criteria")
+        ranges = []
+        criteria = []
+        for range_node, criterion_node in zip(arguments[::2], arguments[1::2]):
+            if range_node[0] == "table" and not range_node[3]:
+                range_node = self.table_range(range_node)
+            if range_node[0] != "range":
+                raise UnsupportedFormula("COUNTIFS needs ranges")
+            ranges.append((range_node[1] or sheet, range_node))
+            criteria.append(_criterion(self.evaluate(criterion_node, sheet, row)))
+
+        # Every COUNTIFS over the same ranges shares one count of their value combinations
+        key = tuple(ranges)
+        if key not in self.counts:
+            columns = [
+                [_normalized(self.cell(range_sheet, *cell)) for cell in self.range_cells(range_node, range_sheet)[1]]
+                for range_sheet, range_node in ranges
+            ]
+            same_size = len({len(column) for column in columns}) == 1
+            self.counts[key] = Counter(zip(*columns)) if same_size else None
+        if self.counts[key] is None:
+            return VALUE_ERROR
+        return float(self.counts[key][tuple(criteria)])
+
+
+def _number(value):
+    # Cell values from the data rows: ints become floats like every other number
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if hasattr(value, "total_seconds"):
+        return value.total_seconds() / 86400
+    return value
+
+
+def _normalized(value):
+    if isinstance(value, bool):
+        return ("b", value)
+    if isinstance(value, float):
+        return ("n", value)
+    if isinstance(value, str):
+        return ("s", value.lower())
+    return None
+
+
+def _criterion(value):
+    if isinstance(value, str):
+        if value[:1] in "<>=" or "*" in value or "?" in value:
+            raise UnsupportedFormula(f"Unsupported COUNTIFS criterion {value!r}")
+        try:
+            return ("n", float(value))
+        except ValueError:
+            return ("s", value.lower())
+    if value is None or isinstance(value, ExcelError):
+        raise UnsupportedFormula(f"Unsupported COUNTIFS criterion {value!r}")
+    return _normalized(float(value) if not isinstance(value, bool) else value)
+
+
+def _arithmetic_operand(value):
+    if value is None:
+        return 0.0
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return VALUE_ERROR
+    return value
+
+
+def _arithmetic(operator, left, right):
+    left = _arithmetic_operand(left)
+    right = _arithmetic_operand(right)
+    for value in (left, right):
+        if isinstance(value, ExcelError):
+            return value
+    if operator == "+":
+        return left + right
+    if operator == "-":
+        return left - right
+    if operator == "*":
+        return left * right
+    return DIV_ZERO if right == 0 else left / right
+
+
+def _compare(operator, left, right):
+    for value in (left, right):
+        if isinstance(value, ExcelError):
+            return value
+    # An empty cell compares as 0 against numbers and as "" against text
+    if left is None:
+        left = "" if isinstance(right, str) else 0.0
+    if right is None:
+        right = "" if isinstance(left, str) else 0.0
+    # Excel orders numbers before text before booleans
+    rank = lambda value: 2 if isinstance(value, bool) else 1 if isinstance(value, str) else 0
+    left_key = (rank(left), left.lower() if isinstance(left, str) else left)
+    right_key = (rank(right), right.lower() if isinstance(right, str) else right)
+    return COMPARISONS[operator](left_key, right_key)
+
+
+def format_value(value):
+    """Return (cell type, <v> text) for a computed value."""
+    if isinstance(value, bool):
+        return "b", "1" if value else "0"
+    if isinstance(value, ExcelError):
+        return "e", value.code
+    if isinstance(value, str):
+        return "str", escape(value)
+    if value is None:
+        return None, "0"
+    if value == int(value) and abs(value) < 1e15:
+        return None, str(int(value))
+    return None, repr(value)
+
+
+def with_cached_values(xml, values):
+    """Return worksheet XML with each formula cell's <v> set from values[(row, column)]."""
+
+    def replace(match):
+        letters, row, attributes, body = match.groups()
+        cell = (int(row), column_number(letters))
+        if cell not in values or body is None:
+            return match.group(0)
+        formula = FORMULA_PATTERN.search(body)
+        if formula is None:
+            return match.group(0)
+        kind, text = format_value(values[cell])
+        attributes = re.sub(r'\s+t="\w+"', "", attributes)
+        if kind:
+            attributes += f' t="{kind}"'
+        return f'<c r="{letters}{row}"{attributes}>{formula.group(0)}<v>{text}</v></c>'
+
+    return CELL_PATTERN.sub(replace, xml)
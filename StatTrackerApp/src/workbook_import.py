@@ -0,0 +1,86 @@
+# Reading event rows back out of exported workbooks
+
+import datetime
+import sys
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from event_schema import GAME_FIELDS
+from event_store import PLAYER_NUMBER, VIDEO_TIME, video_time_seconds
+from excel_export import RAW_DATA_SHEET
+
+FIRST_DATA_ROW = 2  # Row 1 of the Raw Data sheet is left empty by the template
+ROW_FIELDS = 11
+
+
+def video_time_text(value):
+    """Return a Raw Data video time cell as "MM:SS"; newer exports store it as a duration."""
+    if isinstance(value, datetime.timedelta):
+        seconds = round(value.total_seconds())
+    elif isinstance(value, datetime.time):
+        seconds = value.hour * 3600 + value.minute * 60 + value.second
+    elif isinstance(value, (int, float)):
+        seconds = round(value * 86400)  # A duration read without its number format, in days
+    else:
+        return cell_text(value)
+    return f"{seconds // 60:02}:{seconds % 60:02}"
+
+
+def cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def event_row(values):
+    """Turn the cell values of one Raw Data row into an event row of text fields."""
+    values = list(values) + [None] * (ROW_FIELDS - len(values))
+    row = [cell_text(value) for value in values[:ROW_FIELDS]]
+    row[VIDEO_TIME] = video_time_text(values[VIDEO_TIME])
+    row[PLAYER_NUMBER] = row[PLAYER_NUMBER].lstrip("#")
+    return tuple(row)
+
+
+def raw_data_rows(path, sheet_name=RAW_DATA_SHEET):
+    """Stream (sheet row number, event row) for a workbook's Raw Data sheet, skipping empty rows.
+
+    The workbook is opened read-only, so rows are parsed as they are consumed and
+    memory use doesn't grow with the number of events.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ValueError(f"Error: '{sheet_name}' sheet not found in {path}.")
+        sheet = workbook[sheet_name]
+        rows = sheet.iter_rows(min_row=FIRST_DATA_ROW, max_col=ROW_FIELDS, values_only=True)
+        for number, values in enumerate(rows, FIRST_DATA_ROW):
+            if any(value is not None for value in values):
+                yield number, event_row(values)
+    finally:
+        workbook.close()
+
+
+def read_workbook_game(path, sheet_name=RAW_DATA_SHEET):
+    """Read an exported workbook back into (game_info, rows) for the event store.
+
+    The game info comes from the first event. Every field is interned, so the names,
+    descriptions and codes repeated on each row are held once in memory.
+    """
+    try:
+        rows = []
+        for number, row in raw_data_rows(path, sheet_name):
+            try:
+                video_time_seconds(row[VIDEO_TIME])
+                int(row[PLAYER_NUMBER])
+            except ValueError:
+                raise ValueError(f"Row {number} of {path} is not a valid event: {', '.join(row)}")
+            rows.append(tuple(map(sys.intern, row)))
+    except InvalidFileException as e:
+        raise ValueError(str(e))
+    if not rows:
+        raise ValueError(f"No events found in {path}.")
+    game_info = {field: rows[0][column] for field, column in GAME_FIELDS.items()}
+    return game_info, rows
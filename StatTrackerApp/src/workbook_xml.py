@@ -0,0 +1,381 @@
+# Writing the Raw Data sheet of an exported workbook directly as XML
+
+import os
+import posixpath
+import re
+import shutil
+import zipfile
+from collections import Counter
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from excel_export import (
+    EXPORT_CHUNK_ROWS,
+    RAW_DATA_SHEET,
+    TEMPLATE_PATH,
+    VIDEO_TIME_FORMAT,
+    ExportCancelled,
+    excel_row,
+    export_workbook,
+)
+from export_manifest import row_key
+from workbook_formulas import Table, UnsupportedFormula, WorkbookCalculator, read_shared_strings, with_cached_values
+
+FIRST_DATA_ROW = 2  # Row 1 of Raw Data is left empty, as the template formulas expect
+COLUMN_LETTERS = "ABCDEFGHIJK"
+SECONDS_PER_DAY = 86400
+
+ROW_PATTERN = re.compile(r'<row r="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+DIMENSION_PATTERN = re.compile(r"<dimension ref=\"[^\"]*\"\s*/>")
+DURATION_STYLE_PATTERN = re.compile(r'<c r="F\d+" s="(\d+)"')
+CALC_PR_PATTERN = re.compile(r"<calcPr\b[^>]*?/>")
+EMPTY_SHEET_DATA_PATTERN = re.compile(r"<sheetData\s*/>|<sheetData>\s*</sheetData>")
+
+NAMESPACES = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+RELATIONSHIP_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+def cell_xml(reference, value, duration_style):
+    """Return one <c> element; text is written inline so no shared strings are needed."""
+    if isinstance(value, str):
+        space = ' xml:space="preserve"' if value != value.strip() else ""
+        return f'<c r="{reference}" t="inlineStr"><is><t{space}>{escape(value)}</t></is></c>'
+    if isinstance(value, int):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    # Durations are stored as a fraction of a day, like any Excel time
+    return f'<c r="{reference}" s="{duration_style}"><v>{value.total_seconds() / SECONDS_PER_DAY!r}</v></c>'
+
+
+def row_xml(row_number, values, duration_style):
+    """Return the <row> element for the typed cell values of one event (see excel_row)."""
+    cells = "".join(
+        cell_xml(f"{letter}{row_number}", value, duration_style)
+        for letter, value in zip(COLUMN_LETTERS, values)
+    )
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+def _relationship_targets(archive, part):
+    # Return {relationship id: member name} from a part's .rels file
+    folder, name = posixpath.split(part)
+    rels_name = posixpath.join(folder, "_rels", name + ".rels")
+    if rels_name not in archive.namelist():
+        return {}
+    targets = {}
+    for relationship in ElementTree.fromstring(archive.read(rels_name)).iterfind("rel:Relationship", NAMESPACES):
+        target = relationship.get("Target")
+        if target.startswith("/"):
+            targets[relationship.get("Id")] = target[1:]
+        else:
+            targets[relationship.get("Id")] = posixpath.normpath(posixpath.join(folder, target))
+    return targets
+
+
+def sheet_parts(archive):
+    """Return {sheet name: zip member name} for every worksheet, in workbook order."""
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    targets = _relationship_targets(archive, "xl/workbook.xml")
+    return {
+        sheet.get("name"): targets[sheet.get(RELATIONSHIP_ID)]
+        for sheet in workbook.iterfind("main:sheets/main:sheet", NAMESPACES)
+    }
+
+
+def sheet_part(archive, sheet_name):
+    """Return the zip member name of a worksheet, found through workbook.xml and its rels."""
+    parts = sheet_parts(archive)
+    if sheet_name not in parts:
+        raise ValueError(f"Error: '{sheet_name}' sheet not found in the workbook.")
+    return parts[sheet_name]
+
+
+def workbook_calculator(archive, sheet_name=RAW_DATA_SHEET):
+    """Return (calculator, {part: (sheet name, xml)}) for the formulas of a workbook's other sheets.
+
+    The calculator is None if a formula can't be computed in Python.
+    """
+    parts = sheet_parts(archive)
+    sheets = {name: archive.read(part).decode("utf-8") for name, part in parts.items()}
+    shared_strings = []
+    if "xl/sharedStrings.xml" in archive.namelist():
+        shared_strings = read_shared_strings(archive.read("xl/sharedStrings.xml").decode("utf-8"))
+
+    tables = []
+    for name, part in parts.items():
+        for target in _relationship_targets(archive, part).values():
+            if target.startswith("xl/tables/"):
+                table = ElementTree.fromstring(archive.read(target))
+                columns = [column.get("name") for column in table.iterfind("main:tableColumns/main:tableColumn", NAMESPACES)]
+                tables.append(Table(table.get("displayName"), name, table.get("ref"), columns))
+
+    formula_sheets = {
+        part: (name, sheets[name]) for name, part in parts.items() if name != sheet_name and "<f" in sheets[name]
+    }
+    try:
+        calculator = WorkbookCalculator(sheets, shared_strings, tables, sheet_name)
+    except UnsupportedFormula:
+        calculator = None
+    return calculator, formula_sheets
+
+
+def cached_sheets(calculator, formula_sheets, data_rows):
+    """Return {part: xml} for the formula sheets with values computed from data_rows, or None."""
+    if calculator is None:
+        return None
+    try:
+        values = calculator.calculate(data_rows)
+    except UnsupportedFormula:
+        return None
+    return {part: with_cached_values(xml, values[name]) for part, (name, xml) in formula_sheets.items()}
+
+
+_template_parts = {}  # path -> (mtime, size, TemplateParts)
+
+
+class TemplateParts:
+    """The members of a template that an export rewrites, prepared once per template file."""
+
+    def __init__(self, path, sheet_name):
+        with zipfile.ZipFile(path) as template:
+            self.sheet_part = sheet_part(template, sheet_name)
+            sheet = template.read(self.sheet_part).decode("utf-8")
+            styles = template.read("xl/styles.xml").decode("utf-8")
+            workbook = template.read("xl/workbook.xml").decode("utf-8")
+            self.calculator, self.formula_sheets = workbook_calculator(template, sheet_name)
+
+        # The sheet is written as head + rows + tail; a template whose sheet already has
+        # rows leaves sheet_head as None and is exported through openpyxl instead
+        self.sheet_head = self.sheet_tail = None
+        match = EMPTY_SHEET_DATA_PATTERN.search(sheet)
+        if match is not None:
+            self.sheet_head = sheet[: match.start()] + "<sheetData>"
+            self.sheet_tail = "</sheetData>" + sheet[match.end() :]
+        self.styles, self.duration_style = _add_duration_style(styles)
+        self.workbook = _full_calc_on_load(workbook, False)
+        self.workbook_full_calc = _full_calc_on_load(workbook)
+
+
+def template_parts(path, sheet_name=RAW_DATA_SHEET):
+    if not os.path.exists(path):
+        raise FileNotFoundError("Excel template file not found.")
+    stat = os.stat(path)
+    cached = _template_parts.get((path, sheet_name))
+    if cached is None or cached[:2] != (stat.st_mtime, stat.st_size):
+        cached = (stat.st_mtime, stat.st_size, TemplateParts(path, sheet_name))
+        _template_parts[(path, sheet_name)] = cached
+    return cached[2]
+
+
+def write_workbook(rows, path, template_path=TEMPLATE_PATH, progress=None, cancel_event=None, typed_rows=None):
+    """Write event rows into the template's Raw Data sheet and save the workbook at path.
+
+    The template zip is streamed member by member: the sheet is generated from the rows
+    with inline strings, styles.xml gains the video time format and the formula sheets
+    get cached values computed from the rows, so the file opens without a recalculation.
+    If a formula can't be computed, workbook.xml asks Excel to recalculate on open
+    instead. Every other member (drawings, the table, calcChain) is copied unchanged.
+    progress(done, total) is called after each chunk of rows and cancel_event is checked
+    between chunks. Nothing is left at path if the export fails or is cancelled.
+    typed_rows, if given, holds excel_row() of every row, already converted by the caller.
+    """
+    rows = list(rows)
+    parts = template_parts(template_path)
+    if parts.sheet_head is None:
+        export_workbook(rows, path, template_path, progress, cancel_event)
+        return
+    if typed_rows is None:
+        typed_rows = [excel_row(row) for row in rows]
+    cached = cached_sheets(parts.calculator, parts.formula_sheets, typed_rows)
+    workbook = parts.workbook if cached is not None else parts.workbook_full_calc
+    cached = cached or {}
+    temp_path = f"{path}.tmp"
+    try:
+        with zipfile.ZipFile(template_path) as template, zipfile.ZipFile(temp_path, "w") as target:
+            for info in template.infolist():
+                target_info = zipfile.ZipInfo(info.filename, info.date_time)
+                target_info.compress_type = info.compress_type
+                if info.filename == parts.sheet_part:
+                    with target.open(target_info, "w") as member:
+                        _write_sheet(member, parts, typed_rows, progress, cancel_event)
+                elif info.filename == "xl/styles.xml":
+                    target.writestr(target_info, parts.styles)
+                elif info.filename == "xl/workbook.xml":
+                    target.writestr(target_info, workbook)
+                elif info.filename in cached:
+                    target.writestr(target_info, cached[info.filename])
+                else:
+                    with template.open(info) as source, target.open(target_info, "w") as member:
+                        shutil.copyfileobj(source, member)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _write_sheet(member, parts, typed_rows, progress, cancel_event):
+    last_row = FIRST_DATA_ROW + len(typed_rows) - 1
+    head = DIMENSION_PATTERN.sub(
+        f'<dimension ref="A1:{COLUMN_LETTERS[-1]}{max(last_row, 1)}"/>', parts.sheet_head, count=1
+    )
+    member.write(head.encode("utf-8"))
+    for start in range(0, len(typed_rows), EXPORT_CHUNK_ROWS):
+        if cancel_event is not None and cancel_event.is_set():
+            raise ExportCancelled("Export cancelled.")
+        chunk = typed_rows[start : start + EXPORT_CHUNK_ROWS]
+        member.write(
+            "".join(
+                row_xml(FIRST_DATA_ROW + start + offset, values, parts.duration_style)
+                for offset, values in enumerate(chunk)
+            ).encode("utf-8")
+        )
+        if progress is not None:
+            progress(start + len(chunk), len(typed_rows))
+    member.write(parts.sheet_tail.encode("utf-8"))
+
+
+def _add_duration_style(styles):
+    # Add a number format and a cell format for video times; returns (styles, style index)
+    numbers = re.search(r"<numFmts\b[^>]*>(.*?)</numFmts>", styles, re.S)
+    if numbers is None:
+        format_id = 164  # First id available to custom formats
+        opening = re.search(r"<styleSheet\b[^>]*>", styles).group(0)
+        styles = styles.replace(
+            opening, f'{opening}<numFmts count="1"><numFmt numFmtId="{format_id}" formatCode="{VIDEO_TIME_FORMAT}"/></numFmts>', 1
+        )
+    else:
+        ids = [int(number) for number in re.findall(r'numFmtId="(\d+)"', numbers.group(1))]
+        format_id = max([163] + ids) + 1
+        number_format = f'<numFmt numFmtId="{format_id}" formatCode="{VIDEO_TIME_FORMAT}"/>'
+        updated = re.sub(r'count="\d+"', f'count="{len(ids) + 1}"', numbers.group(0), count=1)
+        updated = updated.replace("</numFmts>", number_format + "</numFmts>")
+        styles = styles.replace(numbers.group(0), updated, 1)
+
+    cell_formats = re.search(r"<cellXfs\b[^>]*>(.*?)</cellXfs>", styles, re.S)
+    count = len(re.findall(r"<xf\b", cell_formats.group(1)))
+    cell_format = f'<xf numFmtId="{format_id}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    updated = re.sub(r'count="\d+"', f'count="{count + 1}"', cell_formats.group(0), count=1)
+    updated = updated.replace("</cellXfs>", cell_format + "</cellXfs>")
+    return styles.replace(cell_formats.group(0), updated, 1), count
+
+
+class RowOrderChanged(ValueError):
+    """Raised when the rows can't be updated in place without breaking their time order."""
+
+
+def plan_row_changes(written_keys, rows):
+    """Match event rows, in time order, against the rows already in a workbook.
+
+    written_keys[i] is the row_key of the event in sheet row FIRST_DATA_ROW + i, or None
+    for an empty row. Returns (slots, changes): the row keys after the update and
+    {slot: row or None} for every slot to rewrite or empty. New events reuse the slots of
+    removed or edited events, or else are added after the last row, as long as the sheet
+    stays in the order of rows; when it can't (for example for an event logged late),
+    RowOrderChanged is raised and the workbook has to be written again.
+    """
+    keys = [row_key(row) for row in rows]
+    unmatched = Counter(keys)
+    slots = list(written_keys)
+    freed = []
+    for slot, key in enumerate(slots):
+        if key is not None and unmatched[key] > 0:
+            unmatched[key] -= 1
+        elif key is not None:
+            freed.append(slot)
+
+    new_rows = []
+    for row, key in zip(rows, keys):
+        if unmatched[key] > 0:
+            unmatched[key] -= 1
+            new_rows.append((row, key))
+
+    for reuse_freed in (True, False):
+        planned = list(slots)
+        changes = {}
+        for slot in freed:
+            planned[slot] = None
+            changes[slot] = None
+        free = list(freed) if reuse_freed else []
+        for row, key in new_rows:
+            slot = free.pop(0) if free else len(planned)
+            if slot == len(planned):
+                planned.append(None)
+            planned[slot] = key
+            changes[slot] = row
+        if [key for key in planned if key is not None] == keys:
+            return planned, changes
+    raise RowOrderChanged("The new events don't fit in time order after the rows already written.")
+
+
+def patch_workbook_rows(path, rows, written_keys, sheet_name=RAW_DATA_SHEET, typed_rows=None):
+    """Update an exported workbook in place so its sheet holds exactly rows.
+
+    Only the sheet rows of new, edited and removed events are rewritten, but the whole
+    file is still copied and every cached formula value recomputed. Returns the row keys
+    to remember for the next update. typed_rows is as for write_workbook. Raises
+    RowOrderChanged if the rows can't keep their time order (see plan_row_changes).
+    """
+    slots, changes = plan_row_changes(written_keys, rows)
+    if typed_rows is None:
+        typed_rows = [excel_row(row) for row in rows]
+    typed_by_key = {row_key(row): values for row, values in zip(rows, typed_rows)}
+    data_rows = [typed_by_key[key] if key is not None else None for key in slots]
+    temp_path = f"{path}.tmp"
+    try:
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(temp_path, "w") as target:
+            part = sheet_part(source, sheet_name)
+            cached = cached_sheets(*workbook_calculator(source, sheet_name), data_rows)
+            for info in source.infolist():
+                data = source.read(info.filename)
+                if info.filename == part:
+                    data = _patch_sheet(data.decode("utf-8"), len(written_keys), changes, data_rows).encode("utf-8")
+                elif info.filename == "xl/workbook.xml":
+                    data = _full_calc_on_load(data.decode("utf-8"), cached is None).encode("utf-8")
+                elif cached and info.filename in cached:
+                    data = cached[info.filename].encode("utf-8")
+                target.writestr(info, data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return slots
+
+
+def _patch_sheet(sheet, written_count, changes, data_rows):
+    match = DURATION_STYLE_PATTERN.search(sheet)
+    if match is None:
+        raise ValueError("The workbook has no video time cells to copy the format from.")
+    duration_style = match.group(1)
+
+    # Slots already in the sheet are rewritten in place, the others go after its last row
+    replacements = {}
+    appended = []
+    for slot, row in sorted(changes.items()):
+        row_number = FIRST_DATA_ROW + slot
+        xml = "" if row is None else row_xml(row_number, data_rows[slot], duration_style)
+        if slot < written_count:
+            replacements[row_number] = xml
+        else:
+            appended.append(xml)
+
+    if replacements:
+        sheet = ROW_PATTERN.sub(lambda match: replacements.get(int(match.group(1)), match.group(0)), sheet)
+    if appended:
+        sheet = sheet.replace("</sheetData>", "".join(appended) + "</sheetData>", 1)
+    last_row = FIRST_DATA_ROW + len(data_rows) - 1
+    return DIMENSION_PATTERN.sub(f'<dimension ref="A1:{COLUMN_LETTERS[-1]}{last_row}"/>', sheet, count=1)
+
+
+def _full_calc_on_load(workbook, enabled=True):
+    # Set or clear the flag asking Excel to recalculate every formula when the file is opened
+    match = CALC_PR_PATTERN.search(workbook)
+    if match is None:
+        return workbook
+    calc_pr = re.sub(r'\s+fullCalcOnLoad="\w+"', "", match.group(0))
+    if enabled:
+        calc_pr = calc_pr[:-2].rstrip() + ' fullCalcOnLoad="1"/>'
+    return workbook.replace(match.group(0), calc_pr, 1)